@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+# Cache de resultados de funções idempotentes, usado pelo cliente (cache local,
+# cache_functions no Adaptive_FaaS) e pelo servidor de decisão (cache compartilhado,
+# result_cache_mb). Limitado em bytes (descarta o menos usado, LRU) e com validade por
+# entrada (TTL). Padrões de tamanho e validade
+RESULT_CACHE_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_TTL = 300
+
+class Result_cache:
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES, ttl=RESULT_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict() # chave: (expira em (monotonic), tamanho, valor)
+        self.bytes = 0
+        self.hits = 0
+        self.shared_hits = 0 # faltas locais achadas no cache do servidor (shared_cache)
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+
+    # Valor guardado para a chave, ou None (ausente ou expirado)
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self.remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    # Guarda o valor (size em bytes), descartando os menos usados até caber.
+    # Um valor maior que o cache inteiro não é guardado
+    def put(self, key, value, size, ttl=None):
+        if size > self.max_bytes:
+            return False
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+        return True
+
+    # A última falta foi resolvida pelo cache do servidor
+    def add_shared_hit(self):
+        with self.lock:
+            self.misses -= 1
+            self.shared_hits += 1
+
+    # Chamado com o lock
+    def remove(self, key):
+        self.bytes -= self.entries.pop(key)[1]
+
+    def snapshot(self):
+        with self.lock:
+            hits, shared_hits, misses = self.hits, self.shared_hits, self.misses
+            entries, size, evictions = len(self.entries), self.bytes, self.evictions
+        lookups = hits + shared_hits + misses
+        return {"hits": hits, "shared_hits": shared_hits, "misses": misses,
+                "hit_rate": (hits + shared_hits) / lookups if lookups else 0.0,
+                "entries": entries, "bytes": size, "evictions": evictions}
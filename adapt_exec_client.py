@@ -1,14 +1,362 @@
 import requests
 import json
+import time
+from threading import Event, Lock
+import asyncio
+import io
+import struct
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+from adapt_exec_cache import Result_cache, RESULT_CACHE_BYTES, RESULT_CACHE_TTL
+
+try:
+    import aiohttp
+except ImportError: # aiohttp só é necessário para o AsyncAdaptive_FaaS
+    aiohttp = None
+
+try:
+    import xxhash
+except ImportError: # xxhash só acelera a chave do cache de resultados (senão usa blake2b)
+    xxhash = None
+
+# Cache local de leases concedidos pelo servidor, seguro entre threads
+# {function_name: [[url, usos restantes, expira em, próximo uso, intervalo, último uso até]]}
+# (tempos em monotonic). Num host com intervalo mínimo o servidor reservou os usos do lease
+# espaçados pelo intervalo (interval_secs): cada uso espera o intervalo desde o anterior e
+# todos precisam acontecer até o fim da reserva, quando o host volta a valer para os
+# outros clientes. Uma função pode ter mais de um lease (um esperando o intervalo)
+LEASE_URL, LEASE_REMAINING, LEASE_EXPIRES, LEASE_NEXT_USE, LEASE_INTERVAL, LEASE_LAST_USE = range(6)
+
+class Lease_cache:
+    def __init__(self):
+        self.leases = {}
+        self.lock = Lock()
+
+    # Usa um slot de um lease da função que já possa ser usado, retorna a url ou None
+    def take(self, function_name):
+        with self.lock:
+            leases = self.leases.get(function_name)
+            if not leases:
+                return None
+            now = time.monotonic()
+            leases[:] = [lease for lease in leases if lease[LEASE_REMAINING] > 0
+                         and now < lease[LEASE_EXPIRES] and now <= lease[LEASE_LAST_USE]]
+            if not leases:
+                del self.leases[function_name]
+                return None
+            for lease in leases:
+                if lease[LEASE_NEXT_USE] <= now:
+                    lease[LEASE_REMAINING] -= 1
+                    lease[LEASE_NEXT_USE] = now + lease[LEASE_INTERVAL]
+                    return lease[LEASE_URL]
+            return None
+
+    # Guarda o lease concedido, o uso atual já conta como um dos slots. requested_at:
+    # quando a decisão foi pedida (monotonic), antes do instante da reserva no servidor
+    def put(self, function_name, url, lease, requested_at):
+        now = time.monotonic()
+        interval = lease.get("interval_secs", 0)
+        last_use = requested_at + (lease["slots"] - 1) * interval if interval > 0 else float('inf')
+        with self.lock:
+            self.leases.setdefault(function_name, []).append(
+                [url, lease["slots"] - 1, now + lease["ttl_secs"], now + interval, interval, last_use])
+
+    # Descarta o lease da função (ex.: a url escolhida falhou)
+    def drop(self, function_name):
+        with self.lock:
+            self.leases.pop(function_name, None)
+
+# Relatos das invocações (latência observada ou None, o ticket da vaga de execução a
+# liberar, se a invocação falhou e o tamanho do payload enviado ou None), aguardando para
+# serem enviados ao servidor junto com a próxima decisão (ou por flush_reports). Guarda no
+# máximo MAX_PENDING_REPORTS
+MAX_PENDING_REPORTS = 32
+
+class Latency_reports:
+    def __init__(self):
+        self.pending = []
+        self.lock = Lock()
+
+    def add(self, url, latency, ticket="", failed=False, payload_bytes=None):
+        with self.lock:
+            self.pending.append((url, latency, ticket, failed, payload_bytes))
+            if len(self.pending) > MAX_PENDING_REPORTS:
+                del self.pending[0]
+
+    def drain(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        return pending
+
+    # Parâmetros da decisão (GET /faas) com os relatos pendentes
+    def drain_params(self):
+        pending = self.drain()
+        if not pending:
+            return {}
+        return {'report_url' : [url for url, _, _, _, _ in pending],
+                'report_latency' : ["failed" if failed else "" if latency is None else f"{latency:.6f}"
+                                    for _, latency, _, failed, _ in pending],
+                'report_ticket' : [ticket or "" for _, _, ticket, _, _ in pending],
+                'report_bytes' : ["" if size is None else str(size) for _, _, _, _, size in pending]}
+
+    # Corpo do POST /faas/report com os relatos pendentes
+    def drain_json(self):
+        pending = self.drain()
+        if not pending:
+            return None
+        return {"reports": [{"url": url, "latency_secs": latency, "ticket": ticket, "failed": failed,
+                             "payload_bytes": size}
+                            for url, latency, ticket, failed, size in pending]}
+
+# Requisições especulativas (hedge): atraso usado com hedge_delay="p95" enquanto o
+# servidor ainda não tem amostras de latência do host escolhido
+HEDGE_DEFAULT_DELAY = 5.0
+
+# Contadores das requisições especulativas, seguros entre threads
+class Hedge_stats:
+    def __init__(self):
+        self.requests = 0 # requisições feitas com hedge habilitado
+        self.fired = 0    # a primeira demorou mais que o atraso e o hedge foi enviado
+        self.won = 0      # a resposta usada foi a do hedge
+        self.lock = Lock()
+
+    def add(self, fired, won):
+        with self.lock:
+            self.requests += 1
+            self.fired += fired
+            self.won += won
+
+    def snapshot(self):
+        with self.lock:
+            requests, fired, won = self.requests, self.fired, self.won
+        return {"requests": requests, "fired": fired, "won": won,
+                "fire_rate": fired / requests if requests else 0.0,
+                "win_rate": won / fired if fired else 0.0}
+
+# Quantas alternativas pedir ao servidor: uma para o hedge e uma por tentativa de failover
+def candidate_count(hedge_delay, failover_attempts):
+    return (hedge_delay is not None) + failover_attempts
+
+# Atraso até disparar o hedge: fixo (segundos) ou o p95 da latência observada na url
+# escolhida, informado pelo servidor junto com os candidatos
+def hedge_delay_for(hedge_delay, candidates):
+    if hedge_delay is None or hedge_delay != "p95":
+        return hedge_delay
+    p95 = candidates[0].get("p95_secs") if candidates else None
+    return HEDGE_DEFAULT_DELAY if p95 is None else p95
+
+# Se o erro da invocação é falha do host (conexão, timeout ou 5xx), que o tira da escolha
+# e passa ao próximo candidato. Um 4xx é a resposta da própria função ao payload: outro
+# host responderia o mesmo, então vai direto para quem chamou, sem marcar o host
+def host_failure(error):
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    if aiohttp is not None and isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500
+    return True
+
+def check_hedge_delay(hedge_delay):
+    if hedge_delay is None or hedge_delay == "p95":
+        return
+    if isinstance(hedge_delay, str) or hedge_delay < 0:
+        raise ValueError("hedge_delay deve ser None, um número de segundos >= 0 ou \"p95\".")
+
+# Hash rápido do payload: xxh3 de 128 bits com o xxhash instalado, senão blake2b
+def payload_hasher():
+    return xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+
+# Chave do resultado no cache: função, Content-Type e hash do corpo já preparado
+# (prepare_payload). Arquivo aberto não é lido para o hash: sem chave (None), sem cache
+def result_cache_key(function_name, data, headers):
+    if isinstance(data, Buffer_reader):
+        buffers = data.buffers
+    elif hasattr(data, 'read'):
+        return None
+    elif isinstance(data, str):
+        buffers = [data.encode('utf-8')]
+    elif isinstance(data, dict):
+        buffers = [json.dumps(data, sort_keys=True).encode('utf-8')]
+    else:
+        try:
+            buffers = [as_byte_view(data)]
+        except TypeError:
+            return None
+    hasher = payload_hasher()
+    hasher.update((headers or {}).get('Content-Type', '').encode('utf-8') + b'\0')
+    for buffer in buffers:
+        hasher.update(buffer)
+    return f"{function_name}:{hasher.hexdigest()}"
+
+# Funções com cache: lista de nomes (validade padrão) ou {nome: validade em segundos ou None}
+def cache_function_ttls(cache_functions):
+    if isinstance(cache_functions, dict):
+        return dict(cache_functions)
+    return dict.fromkeys(cache_functions or ())
+
+# Leitor (file-like) sobre uma sequência de buffers. O requests/aiohttp envia como stream
+# com Content-Length, então os buffers (ex.: cabeçalho + array) não são juntados num bytes
+class Buffer_reader(io.RawIOBase):
+    def __init__(self, buffers):
+        super().__init__()
+        self.buffers = [as_byte_view(buffer) for buffer in buffers]
+        self.length = sum(len(buffer) for buffer in self.buffers)
+        self.index = 0
+        self.offset = 0
+        self.position = 0
+
+    def __len__(self):
+        return self.length
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length - self.position
+        while self.index < len(self.buffers):
+            buffer = self.buffers[self.index]
+            if self.offset < len(buffer):
+                chunk = buffer[self.offset:self.offset + size]
+                self.offset += len(chunk)
+                self.position += len(chunk)
+                return chunk
+            self.index += 1
+            self.offset = 0
+        return b''
+
+# Corpo para mais um envio do mesmo payload (hedge/failover): um Buffer_reader novo sobre os
+# mesmos buffers, sem cópia. Arquivo aberto não pode ser lido duas vezes (None)
+def replayable_payload(data):
+    if isinstance(data, Buffer_reader):
+        return Buffer_reader(data.buffers)
+    if hasattr(data, 'read'):
+        return None
+    return data
+
+# Visão em bytes (sem cópia) de qualquer objeto com buffer: bytes, bytearray, memoryview,
+# array numpy... Só copia se o buffer não for contíguo
+def as_byte_view(data):
+    view = memoryview(data)
+    if not view.c_contiguous:
+        view = memoryview(view.tobytes())
+    return view.cast('B') if view.format != 'B' or view.ndim != 1 else view
+
+# Monta o corpo e os headers da requisição FaaS conforme o tipo escolhido pelo usuário
+def prepare_payload(data, json=False, text=False):
+    if json and text:
+        raise ValueError("A requisição não pode ser json e texto simultâneamente")
+
+    if json:
+        return data, None
+
+    if text:
+        return data, {'Content-Type' : 'text-plain'}
+
+    #se o usuario não especificar, manda como byte cru    
+    headers = {'Content-Type' : 'application/octet-stream'}
+    #coficar como ascii 
+    if type(data) == str:
+        return bytes(data, encoding='ascii'), headers
+    # arquivo aberto: enviado em stream, direto do disco
+    if hasattr(data, 'read'):
+        return data, headers
+    # vários buffers (ex.: pack_ndarray): enviados em sequência, sem juntar
+    if isinstance(data, (list, tuple)):
+        reader = Buffer_reader(data)
+        headers['Content-Length'] = str(len(reader))
+        return reader, headers
+    # bytes, memoryview, array numpy...: enviado sem cópia
+    return as_byte_view(data), headers
+
+# Tamanho (bytes) do corpo preparado por prepare_payload, enviado ao servidor na decisão e
+# nos relatos (política transfer). None se não dá para saber sem ler (ex.: form em dict)
+def payload_size(data):
+    if isinstance(data, (Buffer_reader, bytes, bytearray)):
+        return len(data)
+    if isinstance(data, memoryview):
+        return data.nbytes
+    if isinstance(data, str):
+        return len(data) if data.isascii() else len(data.encode('utf-8'))
+    # arquivo aberto: o que falta ler
+    if hasattr(data, 'fileno') and hasattr(data, 'tell'):
+        try:
+            return max(0, os.fstat(data.fileno()).st_size - data.tell())
+        except (OSError, ValueError):
+            return None
+    return None
+
+# Codificação compacta de arrays (ex.: imagem do cv2): cabeçalho pequeno com dtype e
+# shape seguido do buffer do array. Retorna (cabeçalho, buffer) para ser passado ao
+# request() sem cópia; do lado da função, unpack_ndarray() refaz o array
+NDARRAY_MAGIC = b'NDA1'
+
+def pack_ndarray(array):
+    dtype = array.dtype.str.encode('ascii')
+    header = struct.pack(f'<4sB{len(dtype)}sB{array.ndim}I', NDARRAY_MAGIC, len(dtype), dtype,
+                         array.ndim, *array.shape)
+    return header, array
+
+def unpack_ndarray(buffer):
+    import numpy
+
+    view = memoryview(buffer)
+    magic, dtype_len = struct.unpack_from('<4sB', view, 0)
+    if magic != NDARRAY_MAGIC:
+        raise ValueError("Payload não está no formato pack_ndarray")
+    offset = 5
+    dtype = bytes(view[offset:offset + dtype_len]).decode('ascii')
+    offset += dtype_len
+    ndim = view[offset]
+    offset += 1
+    shape = struct.unpack_from(f'<{ndim}I', view, offset)
+    offset += 4 * ndim
+    return numpy.frombuffer(view, dtype=dtype, offset=offset).reshape(shape)
+
+# Imagem já comprimida em JPEG (bem menor que o array), pronta para request().
+# Quem já tem o arquivo .jpg pode passar o arquivo aberto direto, sem decodificar
+def encode_jpeg(image, quality=90):
+    import cv2
+
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Falha ao codificar a imagem em JPEG")
+    return encoded
+
+# URL do endpoint /faas do servidor de decisão
+def faas_endpoint(server_url):
+    return f"{server_url}/faas" if not server_url.endswith('/faas') else server_url
 
 class Adaptive_FaaS():
     server_url : str
     config_file_path : str
     initialized : bool = False
 
-    def __init__(self, server_url, config_file_path):
+    # lease_slots > 1 pede ao servidor leases: a mesma url vale para vários usos
+    # (até o servidor permitir), guardados em cache local até acabarem ou expirarem
+    # embedded=True dispensa o servidor: a decisão roda neste processo (server_url pode ser None)
+    # pool_size é o máximo de conexões keep-alive mantidas por host (servidor de decisão e
+    # cada gateway FaaS), use o número de threads que chamam request() ao mesmo tempo
+    # report_latency relata ao servidor a latência observada de cada invocação
+    # hedge_delay habilita requisições especulativas no request(): se a resposta não chegar
+    # em hedge_delay segundos (ou no p95 observado do host, com "p95"), o mesmo payload vai
+    # para o próximo candidato e vale a primeira resposta
+    # failover_attempts: quantos candidatos seguintes o request() tenta, sem nova decisão,
+    # quando uma tentativa falha (timeout vale por tentativa). Hedge e failover não usam leases
+    # cache_functions: funções idempotentes cujo resultado fica em cache (lista de nomes ou
+    # {nome: validade em segundos}); o mesmo payload de novo volta na hora, sem envio e sem
+    # execução. cache_max_bytes e cache_ttl limitam o cache local. shared_cache também
+    # consulta e alimenta o cache do servidor de decisão (result_cache_mb no config.yml),
+    # compartilhado entre clientes
+    def __init__(self, server_url, config_file_path, lease_slots=1, embedded=False, pool_size=10,
+                 report_latency=True, hedge_delay=None, failover_attempts=0, cache_functions=None,
+                 cache_max_bytes=RESULT_CACHE_BYTES, cache_ttl=RESULT_CACHE_TTL, shared_cache=False):
             
-        if not server_url: #se não tiver url de servidor
+        if not server_url and not embedded: #se não tiver url de servidor
             print("Erro: url do servidor não definida\n", 
                   "uso: Adaptive_FaaS(<url do hospedeiro>, <caminho do arquivo de configuração>)")
             raise ValueError("A URL do servidor não pode ser nula.")
@@ -18,9 +366,36 @@ class Adaptive_FaaS():
                   "uso: Adaptive_FaaS(<url do hospedeiro>, <caminho do arquivo de configuração>)")
             raise ValueError("O caminho do arquivo de configuração não pode ser nulo.")
 
+        if shared_cache and embedded:
+            raise ValueError("shared_cache precisa do servidor de decisão (embedded=False).")
+
         # Define os valores passados na inicialização
         self.server_url = server_url
         self.config_file_path = config_file_path
+        self.lease_slots = lease_slots
+        self.embedded = embedded
+        self.scheduler = None
+        # Sessão compartilhada entre threads: o urllib3 mantém um pool de conexões por host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.pool_size = pool_size
+        self.leases = Lease_cache()
+        self.report_latency = report_latency
+        self.reports = Latency_reports()
+        check_hedge_delay(hedge_delay)
+        self.hedge_delay = hedge_delay
+        self.hedges = Hedge_stats()
+        self.failover_attempts = failover_attempts
+        # Tentativas com candidatos; a que perde o hedge termina em segundo plano (o requests
+        # não a aborta)
+        self.attempt_executor = None
+        if candidate_count(hedge_delay, failover_attempts):
+            self.attempt_executor = ThreadPoolExecutor(max_workers=2 * pool_size)
+        self.cache_functions = cache_function_ttls(cache_functions)
+        self.results = Result_cache(cache_max_bytes, cache_ttl)
+        self.shared_cache = shared_cache
         self.initialized = True
     
     def send_config(self):
@@ -31,6 +406,9 @@ class Adaptive_FaaS():
         if not self.initialized:
             print("[ERRO] A classe Adaptive_FaaS não foi inicializada corretamente.")
             return False
+
+        if self.embedded:
+            return self.load_embedded_config()
                      
         headers = { 'Content-Type' :'text/plain' }
 
@@ -39,8 +417,8 @@ class Adaptive_FaaS():
                 config = file.read()
 
             # Garante que a URL base para POST e GET seja a mesma
-            post_url = f"{self.server_url}/faas" if not self.server_url.endswith('/faas') else self.server_url
-            response = requests.post(post_url, data=config, headers=headers, timeout=5)
+            post_url = faas_endpoint(self.server_url)
+            response = self.session.post(post_url, data=config, headers=headers, timeout=5)
             response.raise_for_status() # Lança uma exceção para status de erro (4xx ou 5xx)
         
         except FileNotFoundError:
@@ -55,6 +433,95 @@ class Adaptive_FaaS():
         
         print("[INFO] Configuração enviada com sucesso para o servidor.")
         return True
+    # Modo embutido: carrega a configuração no agendador local (parse_config) e inicia a
+    # coleta de métricas numa thread, como o servidor faria
+    def load_embedded_config(self):
+        try:
+            from adapt_exec_server import Embedded_scheduler
+
+            with open(self.config_file_path, 'r') as file: 
+                config = file.read()
+
+            if self.scheduler is None:
+                self.scheduler = Embedded_scheduler()
+            self.scheduler.load_config(config)
+
+        except FileNotFoundError:
+            print(f"\n[ERRO] O arquivo de configuração '{self.config_file_path}' não foi encontrado.")
+            return False
+        except Exception as e:
+            print(f"\n[ERRO] Ocorreu um erro inesperado: {e}")
+            return False
+
+        print("[INFO] Configuração carregada no agendador embutido.")
+        return True
+
+    # Relata o fim de uma invocação na url: latência observada (None se não medida), o
+    # ticket da vaga de execução e se falhou. No modo embutido vai direto para o agendador;
+    # senão a latência fica pendente até a próxima decisão, e ticket e falha são enviados na
+    # hora, liberando a vaga e tirando o host da escolha. payload_bytes (tamanho do payload
+    # enviado) acompanha a latência para o servidor estimar o enlace até o host
+    def report(self, url, latency, ticket="", failed=False, payload_bytes=None):
+        if not self.report_latency:
+            latency = None
+        if latency is None and not ticket and not failed:
+            return
+        if latency is None:
+            payload_bytes = None
+        if self.embedded:
+            if self.scheduler is not None:
+                self.scheduler.report(url, latency, ticket, failed, payload_bytes)
+            return
+        self.reports.add(url, latency, ticket, failed, payload_bytes)
+        if ticket or failed:
+            self.flush_reports()
+
+    # Envia os relatos pendentes sem esperar uma decisão (ex.: usando leases)
+    def flush_reports(self):
+        body = self.reports.drain_json()
+        if self.embedded or body is None:
+            return True
+        try:
+            response = self.session.post(faas_endpoint(self.server_url) + "/report",
+                                         json=body, timeout=5)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"\n[ERRO] Falha ao relatar latências: {e}")
+            return False
+        return True
+
+    # Estatísticas dos pools de conexão: {host:porta: {conexões abertas, requisições,
+    # conexões ociosas no pool}}
+    def pool_stats(self):
+        stats = {}
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                stats[f"{pool.host}:{pool.port}"] = {
+                    "connections_opened": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "idle_connections": pool.pool.qsize() if pool.pool else 0
+                }
+        return stats
+
+    # Quantas requisições usaram hedge, quantos hedges dispararam e quantos venceram
+    def hedge_stats(self):
+        return self.hedges.snapshot()
+
+    # Acertos (locais e no cache do servidor), faltas, taxa de acerto e ocupação do cache
+    # de resultados
+    def cache_stats(self):
+        return self.results.snapshot()
+
+    # Fecha as conexões mantidas abertas
+    def close(self):
+        if self.attempt_executor is not None:
+            self.attempt_executor.shutdown(wait=False)
+        self.session.close()
+
     #função pra debugar    
     def get_server_url(self): 
         return self.server_url
@@ -66,77 +533,615 @@ class Adaptive_FaaS():
             
     #   Solicita ao servidor a melhor URL de FaaS para a função especificada pelo cliente.
     #   Retorna a URL em caso de sucesso, ou False em caso de erro.
+    #   Com leases, usa a url em cache enquanto houver usos e ela não tiver expirado.
+
+        return self.get_best_placement(function_name)[0]
+
+    def get_best_placement(self, function_name, payload_bytes=None):
+
+    #   Igual a get_best_url, mas retorna (url, ticket). O ticket identifica a vaga de
+    #   execução ocupada no host (max_concurrent) e deve voltar ao servidor com report()
+
+        return self.get_placement(function_name, payload_bytes=payload_bytes)[:2]
+
+    def get_placement(self, function_name, candidates=0, payload_bytes=None):
+
+    #   Retorna (url, ticket, candidatos). Com candidates > 0 o servidor manda também até
+    #   `candidates` alternativas (hedge/failover): lista ordenada [{"url", "p95_secs"}]
+    #   começando pela url escolhida (vazia sem alternativas ou com lease em cache).
+    #   payload_bytes: tamanho do payload a enviar, para o servidor pesar o tempo de envio
 
         if not self.initialized:
             print("Erro: Modulo não inicializado, use Adaptive_FaaS(<url do hospedeiro>, <caminho do arquivo de configuração>) para inicializar)\n", 
                   "e em seguida, send_config() para enviar a configuração para o hospedeiro")
-            return None
+            return None, "", []
 
         if not function_name:
             print("[ERRO] O nome da função (function_name) é obrigatório.")
-            return None
+            return None, "", []
+
+        if self.embedded:
+            if self.scheduler is None:
+                print("[ERRO] Configuração não carregada, use send_config() antes.")
+                return None, "", []
+            if candidates > 0:
+                return self.scheduler.select_with_candidates(function_name, candidates, payload_bytes or 0)
+            return (*self.scheduler.select(function_name, payload_bytes or 0), [])
 
+        use_lease = self.lease_slots > 1 and candidates <= 0
+        if use_lease:
+            leased_url = self.leases.take(function_name)
+            if leased_url:
+                return leased_url, "", []
+
+        requested_at = time.monotonic()
         try:
             # Constrói a URL para a requisição GET, adicionando o nome da função requisitada
-            get_url = f"{self.server_url}/faas" if not self.server_url.endswith('/faas') else self.server_url
+            get_url = faas_endpoint(self.server_url)
+            params = {'function_name' : function_name}
+            if use_lease:
+                params['lease_slots'] = self.lease_slots
+            if candidates > 0:
+                params['candidates'] = candidates
+            if payload_bytes is not None:
+                params['payload_bytes'] = payload_bytes
+            params.update(self.reports.drain_params())
             
-            response = requests.get(get_url, params={'function_name' : function_name}, timeout=10)
+            response = self.session.get(get_url, params=params, timeout=10)
             response.raise_for_status() # Verifica se houve erros na requisição
 
             response_json = response.json()
             best_faas = response_json.get("best_faas_url")
-            return best_faas
+
+            # Guarda o lease concedido, este uso já conta como um dos slots
+            lease = response_json.get("lease")
+            if best_faas and lease:
+                self.leases.put(function_name, best_faas, lease, requested_at)
+            return best_faas, response_json.get("ticket", ""), response_json.get("candidates", [])
 
         except requests.exceptions.HTTPError as e:
             # Erros específicos da resposta do servidor (como 404 - Not Found)
             print(f"\n[ERRO] O servidor retornou um erro: {e.response.status_code} {e.response.reason}")
             print(f"   Detalhes: {e.response.text}")
-            return False
+            return False, "", []
         except requests.exceptions.RequestException as e:
             print(f"\n[ERRO] Falha ao consultar o servidor: {e}")
-            return False
+            return False, "", []
         except json.JSONDecodeError:
             print("\n[ERRO] Falha ao decodificar a resposta JSON do servidor.")
-            return False
+            return False, "", []
         except Exception as e:
             print(f"\n[ERRO] Um erro inesperado ocorreu durante a requisição: {e}")
-            return False
+            return False, "", []
+
+
+    def get_best_urls(self, function_name, count):
+
+    #   Solicita ao servidor `count` posições para a função numa única requisição (lote).
+    #   Retorna a lista de URLs em caso de sucesso, ou False em caso de erro.
+
+        return self.get_best_placements(function_name, count)[0]
+
+    def get_best_placements(self, function_name, count, payload_bytes=None):
+
+    #   Igual a get_best_urls, mas retorna (urls, tickets), na mesma ordem
+
+        if not function_name:
+            print("[ERRO] O nome da função (function_name) é obrigatório.")
+            return None, []
+
+        if self.embedded:
+            if self.scheduler is None:
+                print("[ERRO] Configuração não carregada, use send_config() antes.")
+                return None, []
+            return self.scheduler.select_many(function_name, count, payload_bytes or 0)
+
+        try:
+            params = {'function_name' : function_name, 'count' : count}
+            if payload_bytes is not None:
+                params['payload_bytes'] = payload_bytes
+            params.update(self.reports.drain_params())
+            response = self.session.get(faas_endpoint(self.server_url), params=params, timeout=10)
+            response.raise_for_status()
+            response_json = response.json()
+            best_urls = response_json.get("best_faas_urls")
+            return best_urls, response_json.get("tickets") or [""] * len(best_urls or [])
 
+        except requests.exceptions.HTTPError as e:
+            print(f"\n[ERRO] O servidor retornou um erro: {e.response.status_code} {e.response.reason}")
+            print(f"   Detalhes: {e.response.text}")
+            return False, []
+        except requests.exceptions.RequestException as e:
+            print(f"\n[ERRO] Falha ao consultar o servidor: {e}")
+            return False, []
+        except json.JSONDecodeError:
+            print("\n[ERRO] Falha ao decodificar a resposta JSON do servidor.")
+            return False, []
+
+    def request_many(self, function_name, payloads, json=False, text=False, timeout=5):
+        #Faz uma requisição faas para cada payload com uma única decisão em lote no servidor.
+        #As chamadas rodam em paralelo (até pool_size) e o retorno segue a ordem dos payloads:
+        #(resposta, url) em caso de sucesso ou a exceção da chamada que falhou
+        payloads = [prepare_payload(data, json, text) for data in payloads]
+        if not payloads:
+            return []
+
+        # A decisão em lote considera o tamanho médio dos payloads
+        sizes = [size for size in (payload_size(data) for data, _ in payloads) if size is not None]
+        best_urls, tickets = self.get_best_placements(function_name, len(payloads),
+                                                      sum(sizes) // len(sizes) if sizes else None)
+        if not best_urls:
+            raise ValueError("Erro ao obter as melhores urls")
+
+        def post(url, ticket, data, headers):
+            try:
+                size = payload_size(data)
+                start = time.monotonic()
+                response = self.session.post(url, data=data, headers=headers, timeout=timeout)
+                response.raise_for_status()
+                self.report(url, time.monotonic() - start, ticket, payload_bytes=size)
+                return response, url
+            except requests.exceptions.RequestException as e:
+                self.report(url, None, ticket, failed=True)
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(payloads))) as executor:
+            futures = [executor.submit(post, url, ticket, data, headers)
+                       for url, ticket, (data, headers) in zip(best_urls, tickets, payloads)]
+            return [future.result() for future in futures]
 
     def request(self, function_name, data, json=False, text=False,timeout=5):
         #Faz a requisição faas a função especificada pelo usuario, retorna a resposta
         #HTTP em caso de sucesso
-        if json and text:
-            raise ValueError("A requisição não pode ser json e texto simultâneamente")
+        #checa se o usuario setou tanto json quanto text para true
+        data, headers = prepare_payload(data, json, text)
+        cache_key = None
+        if function_name in self.cache_functions:
+            cache_key = result_cache_key(function_name, data, headers)
+        if cache_key is None:
+            return self.invoke(function_name, data, headers, timeout)
+
+        result = self.cached_result(function_name, cache_key)
+        if result is None:
+            result = self.invoke(function_name, data, headers, timeout)
+            self.store_result(function_name, cache_key, result)
+        return result
+
+    # Resultado em cache: o local e, com shared_cache, o do servidor de decisão (guardado
+    # também no local). None se não há
+    def cached_result(self, function_name, cache_key):
+        result = self.results.get(cache_key)
+        if result is not None or not self.shared_cache:
+            return result
+        try:
+            response = self.session.get(faas_endpoint(self.server_url) + "/cache",
+                                        params={'key' : cache_key}, timeout=5)
+        except requests.exceptions.RequestException as e:
+            print(f"\n[ERRO] Falha ao consultar o cache do servidor: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        self.results.add_shared_hit()
+        result = (response, response.headers.get('X-Faas-Url', ''))
+        self.results.put(cache_key, result, len(response.content), self.cache_functions[function_name])
+        return result
+
+    # Guarda a resposta de sucesso no cache local e, com shared_cache, no do servidor
+    def store_result(self, function_name, cache_key, result):
+        response, url = result
+        ttl = self.cache_functions[function_name]
+        self.results.put(cache_key, result, len(response.content), ttl)
+        if not self.shared_cache:
+            return
+        params = {'key' : cache_key, 'url' : url}
+        if ttl is not None:
+            params['ttl_secs'] = ttl
+        try:
+            self.session.put(faas_endpoint(self.server_url) + "/cache", data=response.content, params=params,
+                             headers={'Content-Type' : response.headers.get('Content-Type', 'application/octet-stream')},
+                             timeout=5)
+        except requests.exceptions.RequestException as e:
+            print(f"\n[ERRO] Falha ao enviar o resultado ao cache do servidor: {e}")
+
+    # Decisão e invocação, sem cache de resultados
+    def invoke(self, function_name, data, headers, timeout):
+        if self.attempt_executor is not None and replayable_payload(data) is not None:
+            return self.request_with_candidates(function_name, data, headers, timeout)
                 
-        best_faas = self.get_best_url(function_name)
+        size = payload_size(data)
+        best_faas, ticket = self.get_best_placement(function_name, size)
 
         #checagem de erro ao obter a melhor url        
         if not best_faas:
             raise ValueError("Erro ao obter a melhor url")
         print(best_faas)
-        #checa se o usuario setou tanto json quanto text para true
 
-        
-        if json:
-            response = requests.post(best_faas, data=data, timeout=timeout)
+        try:
+            start = time.monotonic()
+            response = self.session.post(best_faas, data=data, headers=headers, timeout=timeout)
+            response.raise_for_status()    
+            self.report(best_faas, time.monotonic() - start, ticket, payload_bytes=size)
+        except requests.exceptions.RequestException as e:
+            if not host_failure(e):
+                self.report(best_faas, None, ticket)
+                raise
+            # Não reutiliza um lease de uma url que falhou
+            self.leases.drop(function_name)
+            self.report(best_faas, None, ticket, failed=True)
+            raise
+        return response, best_faas
+        #lógica com data
+
+    def request_with_candidates(self, function_name, data, headers, timeout):
+        #Igual ao request(), usando as alternativas enviadas pelo servidor junto com a
+        #decisão: se a resposta demorar mais que o atraso do hedge envia o mesmo payload ao
+        #próximo candidato, e se uma tentativa falhar passa ao próximo (até failover_attempts)
+        #sem nova consulta ao servidor. Retorna a primeira resposta de sucesso; um 4xx da
+        #função vai direto para quem chamou (host_failure)
+        size = payload_size(data)
+        best_faas, ticket, candidates = self.get_placement(
+            function_name, candidate_count(self.hedge_delay, self.failover_attempts), size)
+        if not best_faas:
+            raise ValueError("Erro ao obter a melhor url")
+        delay = hedge_delay_for(self.hedge_delay, candidates)
+        alternatives = [candidate["url"] for candidate in candidates[1:]]
+        failovers = self.failover_attempts
+
+        def post(url, url_ticket, body):
+            start = time.monotonic()
+            try:
+                response = self.session.post(url, data=body, headers=headers, timeout=timeout)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                self.report(url, None, url_ticket, failed=host_failure(e))
+                raise
+            self.report(url, time.monotonic() - start, url_ticket, payload_bytes=size)
+            return response, url
+
+        def next_attempt():
+            return self.attempt_executor.submit(post, alternatives.pop(0), "", replayable_payload(data))
+
+        # O atraso do hedge conta do início da tentativa: com o attempt_executor cheio o
+        # tempo na fila dispararia hedges sem o host ter demorado
+        started = Event()
+        def primary():
+            started.set()
+            return post(best_faas, ticket, data)
+
+        pending = {self.attempt_executor.submit(primary)}
+        hedge = None
+        error = None
+        # Vale a primeira resposta de sucesso; a que perde segue em segundo plano e só é relatada
+        while pending:
+            hedge_wait = delay if delay is not None and hedge is None and alternatives else None
+            if hedge_wait is not None:
+                started.wait()
+            done, pending = wait(pending, timeout=hedge_wait, return_when=FIRST_COMPLETED)
+            if not done:
+                hedge = next_attempt()
+                pending.add(hedge)
+                continue
+            for future in done:
+                if future.exception() is None or not host_failure(future.exception()):
+                    for other in pending:
+                        other.cancel()
+                    if delay is not None:
+                        self.hedges.add(hedge is not None, future is hedge and future.exception() is None)
+                    return future.result()
+                error = error or future.exception()
+                if failovers > 0 and alternatives:
+                    failovers -= 1
+                    pending.add(next_attempt())
+
+        if delay is not None:
+            self.hedges.add(hedge is not None, False)
+        raise error
+
+
+# Versão asyncio do cliente (precisa do aiohttp): um único event loop mantém centenas de
+# invocações em andamento, sem uma thread por requisição.
+# concurrency limita quantas invocações map() deixa em andamento ao mesmo tempo e
+# pool_size quantas conexões abertas a sessão compartilhada mantém no total
+class AsyncAdaptive_FaaS():
+
+    def __init__(self, server_url, config_file_path, lease_slots=1, concurrency=100, pool_size=100,
+                 report_latency=True, hedge_delay=None, failover_attempts=0, cache_functions=None,
+                 cache_max_bytes=RESULT_CACHE_BYTES, cache_ttl=RESULT_CACHE_TTL, shared_cache=False):
+        if aiohttp is None:
+            raise RuntimeError("O AsyncAdaptive_FaaS precisa do aiohttp (pip install aiohttp).")
+
+        if not server_url:
+            raise ValueError("A URL do servidor não pode ser nula.")
+        if not config_file_path:
+            raise ValueError("O caminho do arquivo de configuração não pode ser nulo.")
 
-        elif text:
-            headers = {'Content-Type' : 'text-plain'}
-            response = requests.post(best_faas, data=data, headers=headers, timeout=timeout)
+        self.server_url = server_url
+        self.config_file_path = config_file_path
+        self.lease_slots = lease_slots
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+        self.leases = Lease_cache()
+        self.report_latency = report_latency
+        self.reports = Latency_reports()
+        check_hedge_delay(hedge_delay)
+        self.hedge_delay = hedge_delay
+        self.hedges = Hedge_stats()
+        self.failover_attempts = failover_attempts
+        self.cache_functions = cache_function_ttls(cache_functions)
+        self.results = Result_cache(cache_max_bytes, cache_ttl)
+        self.shared_cache = shared_cache
+        # Criada no primeiro uso, dentro do event loop
+        self.session = None
 
-        #se o usuario não especificar, manda como byte cru    
-        elif not json and not text:
-            #coficar como ascii 
-            if type(data) == str:
-                data = bytes(data, encoding='ascii')
-            else:
-                data = bytes(data)    
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
 
-            headers = {'Content-Type' : 'application/octet-stream'}
-            response = requests.post(best_faas, data=data, headers=headers, timeout=timeout)
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
 
-        response.raise_for_status()    
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def send_config(self):
+        try:
+            with open(self.config_file_path, 'r') as file: 
+                config = file.read()
+
+            async with self.get_session().post(faas_endpoint(self.server_url), data=config,
+                                               headers={'Content-Type' : 'text/plain'},
+                                               timeout=aiohttp.ClientTimeout(total=5)) as response:
+                response.raise_for_status()
+
+        except FileNotFoundError:
+            print(f"\n[ERRO] O arquivo de configuração '{self.config_file_path}' não foi encontrado.")
+            return False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"\n[ERRO] Falha ao conectar com o servidor: {e}")
+            return False
+
+        print("[INFO] Configuração enviada com sucesso para o servidor.")
+        return True
+
+    async def get_best_url(self, function_name):
+        return (await self.get_best_placement(function_name))[0]
+
+    # Retorna (url, ticket), como em Adaptive_FaaS.get_best_placement
+    async def get_best_placement(self, function_name, payload_bytes=None):
+        return (await self.get_placement(function_name, payload_bytes=payload_bytes))[:2]
+
+    # Retorna (url, ticket, candidatos), como em Adaptive_FaaS.get_placement
+    async def get_placement(self, function_name, candidates=0, payload_bytes=None):
+        if not function_name:
+            print("[ERRO] O nome da função (function_name) é obrigatório.")
+            return None, "", []
+
+        use_lease = self.lease_slots > 1 and candidates <= 0
+        if use_lease:
+            leased_url = self.leases.take(function_name)
+            if leased_url:
+                return leased_url, "", []
+
+        params = {'function_name' : function_name}
+        if use_lease:
+            params['lease_slots'] = self.lease_slots
+        if candidates > 0:
+            params['candidates'] = candidates
+        if payload_bytes is not None:
+            params['payload_bytes'] = payload_bytes
+        # aiohttp não aceita listas em params, os relatos vão como pares repetidos
+        params = list(params.items())
+        for key, values in self.reports.drain_params().items():
+            params.extend((key, value) for value in values)
+
+        requested_at = time.monotonic()
+        try:
+            async with self.get_session().get(faas_endpoint(self.server_url), params=params,
+                                              timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status >= 400:
+                    print(f"\n[ERRO] O servidor retornou um erro: {response.status} {response.reason}")
+                    print(f"   Detalhes: {await response.text()}")
+                    return False, "", []
+                response_json = await response.json()
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"\n[ERRO] Falha ao consultar o servidor: {e}")
+            return False, "", []
+        except json.JSONDecodeError:
+            print("\n[ERRO] Falha ao decodificar a resposta JSON do servidor.")
+            return False, "", []
+
+        best_faas = response_json.get("best_faas_url")
+        lease = response_json.get("lease")
+        if best_faas and lease:
+            self.leases.put(function_name, best_faas, lease, requested_at)
+        return best_faas, response_json.get("ticket", ""), response_json.get("candidates", [])
+
+    # Relata o fim de uma invocação; ticket e falha vão ao servidor na hora
+    async def report(self, url, latency, ticket="", failed=False, payload_bytes=None):
+        if not self.report_latency:
+            latency = None
+        if latency is None and not ticket and not failed:
+            return
+        if latency is None:
+            payload_bytes = None
+        self.reports.add(url, latency, ticket, failed, payload_bytes)
+        if ticket or failed:
+            await self.flush_reports()
+
+    async def flush_reports(self):
+        body = self.reports.drain_json()
+        if body is None:
+            return True
+        try:
+            async with self.get_session().post(faas_endpoint(self.server_url) + "/report", json=body,
+                                               timeout=aiohttp.ClientTimeout(total=5)) as response:
+                response.raise_for_status()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"\n[ERRO] Falha ao relatar latências: {e}")
+            return False
+        return True
+
+    # Retorna (resposta, url); o corpo já foi lido, use await response.text()/read()
+    async def request(self, function_name, data, json=False, text=False, timeout=5):
+        data, headers = prepare_payload(data, json, text)
+        cache_key = None
+        if function_name in self.cache_functions:
+            cache_key = result_cache_key(function_name, data, headers)
+        if cache_key is None:
+            return await self.invoke(function_name, data, headers, timeout)
+
+        result = await self.cached_result(function_name, cache_key)
+        if result is None:
+            result = await self.invoke(function_name, data, headers, timeout)
+            await self.store_result(function_name, cache_key, result)
+        return result
+
+    # Como Adaptive_FaaS.cached_result
+    async def cached_result(self, function_name, cache_key):
+        result = self.results.get(cache_key)
+        if result is not None or not self.shared_cache:
+            return result
+        try:
+            response = await self.fetch('GET', faas_endpoint(self.server_url) + "/cache", 5,
+                                        params={'key' : cache_key})
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"\n[ERRO] Falha ao consultar o cache do servidor: {e}")
+            return None
+        if response.status != 200:
+            return None
+        self.results.add_shared_hit()
+        result = (response, response.headers.get('X-Faas-Url', ''))
+        self.results.put(cache_key, result, len(await response.read()), self.cache_functions[function_name])
+        return result
+
+    # Como Adaptive_FaaS.store_result
+    async def store_result(self, function_name, cache_key, result):
+        response, url = result
+        body = await response.read()
+        ttl = self.cache_functions[function_name]
+        self.results.put(cache_key, result, len(body), ttl)
+        if not self.shared_cache:
+            return
+        params = {'key' : cache_key, 'url' : url}
+        if ttl is not None:
+            params['ttl_secs'] = str(ttl)
+        try:
+            async with self.get_session().put(faas_endpoint(self.server_url) + "/cache", data=body, params=params,
+                                              headers={'Content-Type' : response.headers.get('Content-Type', 'application/octet-stream')},
+                                              timeout=aiohttp.ClientTimeout(total=5)) as put_response:
+                put_response.raise_for_status()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"\n[ERRO] Falha ao enviar o resultado ao cache do servidor: {e}")
+
+    # Requisição com o corpo inteiro lido, para respostas devolvidas ao chamador. Sem async
+    # with: ler o corpo até o fim já devolve a conexão ao pool, e a resposta liberada pelo
+    # async with não deixaria mais o chamador usar response.read() (só o text()/json())
+    async def fetch(self, method, url, timeout, **kwargs):
+        response = await self.get_session().request(method, url, timeout=aiohttp.ClientTimeout(total=timeout),
+                                                     **kwargs)
+        await response.read()
+        return response
+
+    # Decisão e invocação, sem cache de resultados
+    async def invoke(self, function_name, data, headers, timeout):
+        if candidate_count(self.hedge_delay, self.failover_attempts) and replayable_payload(data) is not None:
+            return await self.request_with_candidates(function_name, data, headers, timeout)
+
+        size = payload_size(data)
+        best_faas, ticket = await self.get_best_placement(function_name, size)
+        if not best_faas:
+            raise ValueError("Erro ao obter a melhor url")
+
+        try:
+            start = time.monotonic()
+            response = await self.fetch('POST', best_faas, timeout, data=data, headers=headers)
+            response.raise_for_status()
+            await self.report(best_faas, time.monotonic() - start, ticket, payload_bytes=size)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if not host_failure(e):
+                await self.report(best_faas, None, ticket)
+                raise
+            self.leases.drop(function_name)
+            await self.report(best_faas, None, ticket, failed=True)
+            raise
         return response, best_faas
-        #lógica com data
 
+    # Como Adaptive_FaaS.request_with_candidates; aqui a tentativa que perde é cancelada
+    async def request_with_candidates(self, function_name, data, headers, timeout):
+        size = payload_size(data)
+        best_faas, ticket, candidates = await self.get_placement(
+            function_name, candidate_count(self.hedge_delay, self.failover_attempts), size)
+        if not best_faas:
+            raise ValueError("Erro ao obter a melhor url")
+        delay = hedge_delay_for(self.hedge_delay, candidates)
+        alternatives = [candidate["url"] for candidate in candidates[1:]]
+        failovers = self.failover_attempts
+
+        async def post(url, url_ticket, body):
+            start = time.monotonic()
+            try:
+                response = await self.fetch('POST', url, timeout, data=body, headers=headers)
+                response.raise_for_status()
+            except asyncio.CancelledError:
+                await self.report(url, None, url_ticket)
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                await self.report(url, None, url_ticket, failed=host_failure(e))
+                raise
+            await self.report(url, time.monotonic() - start, url_ticket, payload_bytes=size)
+            return response, url
+
+        def next_attempt():
+            return asyncio.ensure_future(post(alternatives.pop(0), "", replayable_payload(data)))
+
+        pending = {asyncio.ensure_future(post(best_faas, ticket, data))}
+        hedge = None
+        error = None
+        while pending:
+            hedge_wait = delay if delay is not None and hedge is None and alternatives else None
+            done, pending = await asyncio.wait(pending, timeout=hedge_wait,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                hedge = next_attempt()
+                pending.add(hedge)
+                continue
+            for task in done:
+                if task.exception() is None or not host_failure(task.exception()):
+                    for other in pending:
+                        other.cancel()
+                    if delay is not None:
+                        self.hedges.add(hedge is not None, task is hedge and task.exception() is None)
+                    return task.result()
+                error = error or task.exception()
+                if failovers > 0 and alternatives:
+                    failovers -= 1
+                    pending.add(next_attempt())
+
+        if delay is not None:
+            self.hedges.add(hedge is not None, False)
+        raise error
+
+    def hedge_stats(self):
+        return self.hedges.snapshot()
+
+    def cache_stats(self):
+        return self.results.snapshot()
+
+    # Faz request() para cada payload com no máximo `concurrency` em andamento e retorna
+    # os resultados na mesma ordem; com return_exceptions=True uma falha vira o item da lista
+    async def map(self, function_name, payloads, return_exceptions=False, **kwargs):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded_request(data):
+            async with semaphore:
+                return await self.request(function_name, data, **kwargs)
+
+        return await asyncio.gather(*(bounded_request(data) for data in payloads),
+                                    return_exceptions=return_exceptions)
@@ -1,51 +1,832 @@
 import requests
 import json
+import math
 import yaml
 import time
+import multiprocessing
+import random
+import socket
+import heapq
+import bisect
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass
+from itertools import count, zip_longest
 from threading import Lock, Event, Thread
 from flask import Flask, request, jsonify
+from requests.adapters import HTTPAdapter
+from adapt_exec_cache import Result_cache, RESULT_CACHE_TTL
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError: # gunicorn só é necessário no modo multi-worker (run_production)
+    BaseApplication = None
+
+try:
+    import numpy
+except ImportError: # numpy só é necessário com previsão (forecast_mode) e nas políticas vetorizadas
+    numpy = None
+
+# Timeout (segundos) de cada requisição ao Prometheus
+SCRAPE_TIMEOUT = 5
+
+# Máximo de posições reservadas numa única decisão em lote (GET /faas?count=N)
+MAX_BATCH_SIZE = 1000
+
+# Máximo de alternativas enviadas junto com a decisão (GET /faas?candidates=N), usadas
+# pelo cliente para hedge e failover
+MAX_CANDIDATES = 4
+
+# Tempo padrão (segundos) que um host relatado com falha fica fora da escolha
+FAILURE_BACKOFF = 10
+
+# Queries Prometheus
+QUERY_CPU = "(1 - avg by (instance) (rate(node_cpu_seconds_total{mode=\"idle\"}[15s]))) * 100"
+QUERY_RAM = "((avg_over_time(node_memory_MemTotal_bytes[15s]) - avg_over_time(node_memory_MemAvailable_bytes[15s]))/ avg_over_time(node_memory_MemTotal_bytes[15s])) * 100"
+
+# Latência observada: peso da amostra nova na média móvel exponencial (EWMA) e
+# quantas amostras recentes ficam guardadas para os percentis
+LATENCY_ALPHA = 0.2
+LATENCY_WINDOW = 64
+# Políticas com corte pela nuvem (latency, transfer): a cada LATENCY_PROBE_EVERY decisões
+# de uma função os hosts cortados por estarem mais lentos que a nuvem vão na frente, para
+# serem medidos de novo; sem isso um host lento uma vez não recebe mais invocações e a
+# latência dele nunca mais é atualizada
+LATENCY_PROBE_EVERY = 50
+
+# Enlace até cada host (política transfer): peso da amostra nova na regressão da latência
+# sobre o tamanho do payload, e quanto (desvio, em bytes) os tamanhos observados precisam
+# variar para a inclinação valer como tempo por byte
+LINK_ALPHA = 0.1
+LINK_MIN_SPREAD = 64 * 1024
+
+# Pesos padrão da política weighted (placement_weights): CPU e RAM como fração do limite
+# do host, latência esperada em segundos e 1 para host de prioridade baixa
+PLACEMENT_WEIGHTS = {"cpu": 1.0, "ram": 1.0, "latency": 0.0, "priority": 0.0}
+
+# Tempo padrão (segundos) até uma vaga de execução não confirmada pelo cliente expirar
+IN_FLIGHT_TIMEOUT = 120
+
+# Balanceamento entre as urls (gateways/réplicas) de uma função no mesmo host: a com menos
+# invocações em andamento, ou a melhor de duas sorteadas (barato com muitas réplicas)
+URL_BALANCING = ("least_outstanding", "power_of_two")
+
+# Previsão de CPU/RAM: sem previsão (último valor coletado), tendência linear ou
+# suavização de Holt sobre o histórico recente puxado com query_range
+FORECAST_MODES = ("off", "linear", "holt")
+FORECAST_WINDOW = 120 # segundos de histórico guardados por host
+FORECAST_STEP = 15    # resolução (segundos) das amostras do histórico
+HOLT_ALPHA = 0.5      # peso da amostra nova no nível
+HOLT_BETA = 0.3       # peso da variação nova na tendência
+
+# Coleta adaptativa (adaptive_scrape): cada host tem seu intervalo, entre os limites
+# mínimo e máximo. Com ADAPTIVE_HEADROOM pontos percentuais de folga até o limite de CPU/RAM
+# o intervalo é o refresh_interval_secs; menos folga (ou métrica mudando rápido) coleta
+# mais vezes, mais folga ou host fora do ar coleta menos
+ADAPTIVE_HEADROOM = 20
+SCRAPE_MIN_INTERVAL = 1
+SCRAPE_MAX_INTERVAL = 60
+
+# Métricas enviadas pelos próprios hosts (POST /faas/metrics ou UDP): valem por
+# PUSH_STALE segundos. Depois disso a decisão trata o host como indisponível até a
+# próxima coleta do Prometheus, que volta a valer para ele
+PUSH_STALE = 2
+PUSH_MAX_DATAGRAM = 65535
+
+# Campos de cada vaga de execução simultânea (Slot_table)
+SLOT_EXPIRES, SLOT_FUNCTION, SLOT_GENERATION = range(3)
+SLOT_FIELDS = 3
+# Época de cada Slot_table criada: entra no ticket, então um ticket emitido antes de uma
+# troca de configuração não libera a vaga de outra invocação na tabela nova
+slot_epochs = count(1)
+
+# Campos de cada host na tabela em memória compartilhada (modo multi-worker)
+SHM_SEQ, SHM_CPU, SHM_RAM, SHM_TIMESTAMP, SHM_LAST_USE, SHM_PUSHED = range(6)
+SHM_FIELDS = 6
+
+# Classe para guardar configurações gerais do servidor
+@dataclass
+class Server_settings:
+    __slots__ = ("scrape_deadline", "lease_ttl", "lease_max_slots", "placement_policy",
+                 "placement_weights", "in_flight_timeout", "failure_backoff", "push_stale", "push_udp_port",
+                 "adaptive_scrape", "scrape_min_interval", "scrape_max_interval",
+                 "result_cache_bytes", "result_cache_ttl")
+    scrape_deadline   : float
+    lease_ttl         : float
+    lease_max_slots   : int
+    placement_policy  : str
+    placement_weights : tuple
+    in_flight_timeout : float
+    failure_backoff   : float
+    push_stale        : float
+    push_udp_port     : int
+    adaptive_scrape     : bool
+    scrape_min_interval : float
+    scrape_max_interval : float
+    result_cache_bytes  : int
+    result_cache_ttl    : float
+
+# Latência observada das invocações de um host, informada pelos clientes: média móvel
+# exponencial (usada na decisão) e as últimas LATENCY_WINDOW amostras (percentis)
+class Latency_stats:
+    __slots__ = ("ewma", "samples", "count", "lock", "row")
+
+    def __init__(self):
+        self.ewma = None
+        self.samples = array('d', bytes(8 * LATENCY_WINDOW))
+        self.count = 0
+        self.lock = Lock()
+        # Posição do host em Host_arrays.latency (políticas vetorizadas), None se não há
+        self.row = None
+
+    def add(self, latency):
+        with self.lock:
+            self.samples[self.count % LATENCY_WINDOW] = latency
+            self.count += 1
+            if self.ewma is None:
+                self.ewma = latency
+            else:
+                self.ewma += LATENCY_ALPHA * (latency - self.ewma)
+            if self.row is not None:
+                self.row[0] = self.ewma
+
+    # Latência esperada; host ainda sem amostras conta como 0 para ser experimentado
+    def expected(self):
+        ewma = self.ewma
+        return 0.0 if ewma is None else ewma
+
+    # Percentil (0-100) das amostras recentes, None se não há amostras
+    def percentile(self, q):
+        with self.lock:
+            samples = sorted(self.samples[:min(self.count, LATENCY_WINDOW)])
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+# Enlace até um host, medido passivamente: as invocações relatadas com o tamanho do
+# payload entram numa regressão (com pesos exponenciais) da latência sobre o tamanho. A
+# inclinação é o tempo por byte (1 / vazão) e o intercepto a parte fixa (RTT + execução).
+# rtt_ms e bandwidth_mbps do config.yml valem até haver amostras (a vazão, até os
+# tamanhos variarem pelo menos LINK_MIN_SPREAD)
+class Link_stats:
+    __slots__ = ("count", "mean_size", "mean_latency", "var_size", "cov", "prior_fixed",
+                 "prior_per_byte", "fixed", "per_byte", "lock", "row")
+
+    def __init__(self, rtt_ms=None, bandwidth_mbps=None):
+        self.count = 0
+        self.mean_size = 0.0
+        self.mean_latency = 0.0
+        self.var_size = 0.0
+        self.cov = 0.0
+        self.prior_fixed = (rtt_ms or 0) / 1000
+        self.prior_per_byte = 8 / (bandwidth_mbps * 1e6) if bandwidth_mbps else 0.0
+        self.fixed = self.prior_fixed
+        self.per_byte = self.prior_per_byte
+        self.lock = Lock()
+        # Linha do host em Host_arrays.link (políticas vetorizadas), None se não há
+        self.row = None
+
+    def add(self, size, latency):
+        with self.lock:
+            if self.count == 0:
+                self.mean_size, self.mean_latency = float(size), latency
+            else:
+                size_delta = size - self.mean_size
+                latency_delta = latency - self.mean_latency
+                self.mean_size += LINK_ALPHA * size_delta
+                self.mean_latency += LINK_ALPHA * latency_delta
+                self.var_size = (1 - LINK_ALPHA) * (self.var_size + LINK_ALPHA * size_delta * size_delta)
+                self.cov = (1 - LINK_ALPHA) * (self.cov + LINK_ALPHA * size_delta * latency_delta)
+            self.count += 1
+
+            self.per_byte = self.prior_per_byte
+            if self.var_size >= LINK_MIN_SPREAD ** 2 and self.cov > 0:
+                self.per_byte = self.cov / self.var_size
+            self.fixed = max(0.0, self.mean_latency - self.per_byte * self.mean_size)
+            if self.row is not None:
+                self.row[0] = self.fixed
+                self.row[1] = self.per_byte
+
+    # Tempo esperado (segundos) para enviar `size` bytes e executar; host ainda sem
+    # amostras nem valores no config.yml conta como 0 para ser experimentado
+    def expected(self, size):
+        return self.fixed + size * self.per_byte
+
+# Métricas internas do servidor, expostas em GET /metrics no formato texto do Prometheus.
+# No caminho da decisão só há um append numa deque (atômico, sem lock); os eventos são
+# somados quando /metrics é lido ou quando passam de METRICS_MAX_PENDING.
+# No modo multi-worker cada worker tem as suas, como a latência observada
+METRICS_MAX_PENDING = 10000
+METRICS = {
+    "adapt_decision_seconds": ("histogram", "Tempo da decisão em GET /faas.",
+                               (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)),
+    "adapt_host_selected_total": ("counter", "Vezes que o host foi escolhido.", None),
+    "adapt_host_rejected_total": ("counter", "Vezes que o host foi pulado, por motivo (cpu, ram, stale, interval, slots, latency).", None),
+    "adapt_cloud_fallback_total": ("counter", "Decisões que caíram na nuvem.", None),
+    "adapt_scrape_duration_seconds": ("histogram", "Tempo de coleta das métricas de cada host.",
+                                      (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    "adapt_scrape_last_duration_seconds": ("gauge", "Tempo da última coleta de cada host (NaN se estourou o prazo).", None),
+    "adapt_scrape_errors_total": ("counter", "Coletas sem valor, por motivo (timeout, no_data).", None),
+    "adapt_lock_wait_seconds": ("histogram", "Espera pelo lock de um host quando ele estava ocupado.",
+                                (0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.1)),
+    "adapt_config_reloads_total": ("counter", "Configurações recebidas por POST /faas, por resultado.", None),
+    "adapt_result_cache_total": ("counter", "Consultas ao cache de resultados compartilhado, por resultado (hit, miss).", None),
+}
+
+class Metrics_registry:
+    def __init__(self):
+        self.events = deque()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = Lock()
+
+    # labels: tupla de pares (nome, valor)
+    def inc(self, name, labels=(), value=1):
+        self.events.append((name, labels, value))
+        if len(self.events) > METRICS_MAX_PENDING:
+            self.collect()
+
+    def observe(self, name, value, labels=()):
+        self.inc(name, labels, value)
+
+    def set(self, name, value, labels=()):
+        self.inc(name, labels, value)
+
+    # Vários incrementos num único evento, calculados só na coleta: expand(*args) gera
+    # os labels de cada um
+    def inc_deferred(self, name, expand, *args):
+        self.events.append((name, (expand, args), None))
+        if len(self.events) > METRICS_MAX_PENDING:
+            self.collect()
+
+    # Soma os eventos pendentes
+    def collect(self):
+        with self.lock:
+            events = self.events
+            while events:
+                name, labels, value = events.popleft()
+                kind, _, buckets = METRICS[name]
+                if value is None:
+                    expand, args = labels
+                    for expanded in expand(*args):
+                        key = (name, expanded)
+                        self.counters[key] = self.counters.get(key, 0) + 1
+                    continue
+                key = (name, labels)
+                if kind == "counter":
+                    self.counters[key] = self.counters.get(key, 0) + value
+                    continue
+                if kind == "gauge":
+                    self.gauges[key] = value
+                    continue
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    # contagem por faixa (+Inf por último), soma e total
+                    histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+                histogram[bisect.bisect_left(buckets, value)] += 1
+                histogram[-2] += value
+                histogram[-1] += 1
+
+    def exposition(self):
+        self.collect()
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: list(histogram) for key, histogram in self.histograms.items()}
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind != "histogram":
+                for (metric, labels), value in sorted((counters if kind == "counter" else gauges).items()):
+                    if metric == name:
+                        lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+                continue
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), histogram):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram[-2]}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+# NaN e infinito como o formato texto do Prometheus escreve
+def format_value(value):
+    if value != value:
+        return "NaN"
+    if value in (float('inf'), float('-inf')):
+        return "+Inf" if value > 0 else "-Inf"
+    return value
+
+# Valores de label escapam \, " e quebra de linha, como pede o formato texto
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels) + "}"
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+server_metrics = Metrics_registry()
+
+# Pega o lock medindo a espera (só mede quando ele já estava ocupado)
+def acquire_timed(lock):
+    if lock.acquire(False):
+        return
+    start = time.perf_counter()
+    lock.acquire()
+    server_metrics.observe("adapt_lock_wait_seconds", time.perf_counter() - start)
 
 # Classe para guardar informações da nuvem
 @dataclass
 class Cloud_layer:
-    __slots__ = ("name", "layer", "faas_urls")
+    __slots__ = ("name", "layer", "faas_urls", "latency", "link")
     name      : str
     layer     : str
     faas_urls : list
+    latency   : Latency_stats
+    link      : Link_stats
 
     def getfaas_urls(self): return self.faas_urls
     def getlayer(self)    : return self.layer
     def getname(self)     : return self.name
 
+# Estado dos hosts de uma visão em arrays do numpy, na ordem de view.hosts, para as
+# políticas avaliarem todos os candidatos de uma vez: CPU/RAM publicadas (no modo
+# multi-worker, uma visão direta da Shared_host_table), latência esperada, enlace e os
+# pesos da política weighted
+@dataclass
+class Host_arrays:
+    __slots__ = ("metrics", "latency", "link", "weights")
+    metrics : object # (hosts, 2): CPU, RAM
+    latency : object
+    link    : object # (hosts, 2): parte fixa (segundos), segundos por byte
+    weights : object
+
+# Dados fixos dos candidatos de uma função para as políticas, na ordem de
+# Function_route.candidates: linha de cada host em Host_arrays, limites, prioridade baixa,
+# camada (0 para a primeira camada na ordem de prioridade, 1 para a seguinte...), nomes e
+# a vez do round_robin (lista de um item, avança a cada decisão que reserva)
+@dataclass
+class Route_arrays:
+    __slots__ = ("hosts", "rows", "max_cpu", "max_ram", "low_priority", "tiers", "names", "turn")
+    hosts        : Host_arrays
+    rows         : object
+    max_cpu      : object
+    max_ram      : object
+    low_priority : object
+    tiers        : object
+    names        : tuple
+    turn         : object
+
+# Classe para guardar os candidatos de uma função: tupla (host, Url_pool) em ordem de
+# prioridade, a url da nuvem (fallback), os arrays das políticas (None sem numpy), as
+# decisões com corte pela nuvem (lista de um item, conta para LATENCY_PROBE_EVERY) e a
+# idade a partir da qual as métricas enviadas por push deixam de valer (push_stale)
+@dataclass
+class Function_route:
+    __slots__ = ("candidates", "cloud_url", "cloud_host", "arrays", "cutoff_decisions", "push_stale")
+    candidates       : tuple
+    cloud_url        : str
+    cloud_host       : Cloud_layer
+    arrays           : Route_arrays
+    cutoff_decisions : list
+    push_stale       : float
+
+# Métricas de um host, imutáveis: a thread de coleta publica um objeto novo a cada
+# ciclo e a troca da referência é atômica, então a decisão lê CPU e RAM sem lock.
+# pushed indica que vieram do próprio host (push) e não do Prometheus
+@dataclass(frozen=True)
+class Host_metrics:
+    __slots__ = ("cpu_use", "ram_use", "timestamp", "pushed")
+    cpu_use   : float
+    ram_use   : float
+    timestamp : float
+    pushed    : bool
+
+# Vagas de execução simultânea de um host (max_concurrent), num array de doubles local
+# ou na memória compartilhada: cada vaga guarda quando expira, o código da função e uma
+# geração. A vaga é ocupada na escolha do host e liberada quando o cliente confirma o
+# fim da invocação (ticket "época.vaga.geração") ou quando expira. Quem chama segura o
+# lock do host
+class Slot_table:
+    __slots__ = ("values", "base", "capacity", "timeout", "function_limits", "limits_all", "epoch")
+
+    # function_limits: {nome da função: (código, máximo simultâneo)}
+    # limits_all: o host tem max_concurrent, então toda função ocupa vaga; sem ele só as
+    # funções de function_limits ocupam
+    def __init__(self, values, base, capacity, timeout, function_limits, limits_all, epoch=0):
+        self.values = values
+        self.base = base
+        self.capacity = capacity
+        self.timeout = timeout
+        self.function_limits = function_limits
+        self.limits_all = limits_all
+        self.epoch = epoch
+
+    # Ocupa uma vaga para a função, retorna o ticket ou None se não há vaga.
+    # Função sem limite num host sem max_concurrent não ocupa vaga (ticket "")
+    def acquire(self, now, function_name):
+        values, base = self.values, self.base
+        limit = self.function_limits.get(function_name)
+        if limit is None and not self.limits_all:
+            return ""
+        function_code, function_cap = limit or (0, float('inf'))
+        free = -1
+        running = 0
+        for slot in range(self.capacity):
+            offset = base + slot * SLOT_FIELDS
+            if values[offset + SLOT_EXPIRES] > now:
+                if function_code and values[offset + SLOT_FUNCTION] == function_code:
+                    running += 1
+            elif free < 0:
+                free = slot
+        if free < 0 or running >= function_cap:
+            return None
+
+        offset = base + free * SLOT_FIELDS
+        values[offset + SLOT_EXPIRES] = now + self.timeout
+        values[offset + SLOT_FUNCTION] = function_code
+        values[offset + SLOT_GENERATION] += 1
+        return f"{self.epoch}.{free}.{int(values[offset + SLOT_GENERATION])}"
+
+    # Libera a vaga do ticket; tickets de vagas já expiradas/reusadas ou de outra tabela
+    # (configuração anterior) são ignorados
+    def release(self, ticket):
+        try:
+            epoch, slot, generation = (int(part) for part in ticket.split('.'))
+        except ValueError:
+            return False
+        if epoch != self.epoch or not 0 <= slot < self.capacity:
+            return False
+        offset = self.base + slot * SLOT_FIELDS
+        if self.values[offset + SLOT_GENERATION] != generation or self.values[offset + SLOT_EXPIRES] == 0:
+            return False
+        self.values[offset + SLOT_EXPIRES] = 0
+        return True
+
+    def in_flight(self, now):
+        return sum(1 for slot in range(self.capacity)
+                   if self.values[self.base + slot * SLOT_FIELDS + SLOT_EXPIRES] > now)
+
+# Estado mutável de um host. As métricas são trocadas inteiras (publish) e a reserva
+# (last_use_ts e vagas em execução) tem lock próprio, assim decisões em hosts diferentes
+# não se bloqueiam
+class Host_state:
+    __slots__ = ("metrics", "last_use_ts", "lock", "latency", "slots", "row")
+
+    # slots: Slot_table do host, None se ele não tem limite de execuções simultâneas
+    def __init__(self, slots=None):
+        self.metrics = Host_metrics(cpu_use=0, ram_use=0, timestamp=0, pushed=False)
+        self.last_use_ts = 0
+        self.lock = Lock()
+        self.latency = Latency_stats()
+        self.slots = slots
+        # Linha do host em Host_arrays.metrics, None se não há (sem numpy)
+        self.row = None
+
+    def publish(self, cpu_use, ram_use, pushed=False):
+        self.metrics = Host_metrics(cpu_use=cpu_use, ram_use=ram_use, timestamp=time.time(),
+                                    pushed=pushed)
+        row = self.row
+        if row is not None:
+            row[0] = cpu_use
+            row[1] = ram_use
+
+    # Marca uso do host se o intervalo mínimo já passou e há vaga para a função.
+    # Retorna o ticket da vaga ("" se o host não limita execuções simultâneas) ou None
+    # se não reservou. Com slots > 1 (lease) reserva o intervalo de todos os usos de uma vez
+    def try_reserve(self, now, min_interval, slots=1, function_name=None):
+        acquire_timed(self.lock)
+        try:
+            if (now - self.last_use_ts) < min_interval:
+                return None
+            ticket = ""
+            if self.slots is not None:
+                ticket = self.slots.acquire(now, function_name)
+                if ticket is None:
+                    return None
+            self.last_use_ts = now + (slots - 1) * min_interval
+            return ticket
+        finally:
+            self.lock.release()
+
+    def release(self, ticket):
+        if self.slots is None:
+            return False
+        with self.lock:
+            return self.slots.release(ticket)
+
+    # Host relatado com falha: fica fora da escolha até `until` (mais o intervalo mínimo)
+    def mark_failed(self, until):
+        with self.lock:
+            self.last_use_ts = max(self.last_use_ts, until)
+
+# Urls (gateways/réplicas) de uma função num host. Cada url guarda as invocações em
+# andamento (prazos de expiração, a mais antiga é liberada a cada relato do cliente) e até
+# quando está fora por falha. Com uma só url não há o que balancear nem o que guardar
+class Url_pool:
+    __slots__ = ("urls", "in_flight", "failed_until", "balancing", "timeout", "lock")
+
+    def __init__(self, urls, balancing, timeout):
+        self.urls = tuple(urls)
+        self.in_flight = [deque() for _ in self.urls]
+        self.failed_until = [0.0] * len(self.urls)
+        self.balancing = balancing
+        self.timeout = timeout
+        self.lock = Lock()
+
+    def outstanding(self, index, now):
+        pending = self.in_flight[index]
+        while pending and pending[0] <= now:
+            pending.popleft()
+        return len(pending)
+
+    def best_index(self, now):
+        healthy = [index for index, until in enumerate(self.failed_until) if until <= now]
+        if not healthy:
+            healthy = range(len(self.urls))
+        if self.balancing == "power_of_two" and len(healthy) > 2:
+            first, second = random.sample(healthy, 2)
+            return first if self.outstanding(first, now) <= self.outstanding(second, now) else second
+        return min(healthy, key=lambda index: self.outstanding(index, now))
+
+    # Url que seria escolhida agora, sem contar uma invocação nela
+    def peek(self, now):
+        if len(self.urls) == 1:
+            return self.urls[0]
+        with self.lock:
+            return self.urls[self.best_index(now)]
+
+    # Escolhe a url e conta uma invocação em andamento nela
+    def pick(self, now):
+        if len(self.urls) == 1:
+            return self.urls[0]
+        with self.lock:
+            index = self.best_index(now)
+            self.in_flight[index].append(now + self.timeout)
+            return self.urls[index]
+
+    def release(self, url):
+        if len(self.urls) == 1:
+            return
+        with self.lock:
+            pending = self.in_flight[self.urls.index(url)]
+            if pending:
+                pending.popleft()
+
+    # Tira a url da escolha até `until`; retorna se ainda sobra alguma url saudável
+    def mark_failed(self, url, until):
+        with self.lock:
+            index = self.urls.index(url)
+            self.failed_until[index] = max(self.failed_until[index], until)
+            now = time.time()
+            return any(failed_until <= now for failed_until in self.failed_until)
+
+# Monta os Url_pool de um host, {nome da função: Url_pool}
+def build_url_pools(host, timeout):
+    urls_by_function = {}
+    for url in host.getfaas_urls() or []:
+        urls_by_function.setdefault(function_name_from_url(url), []).append(url)
+    return {func_name: Url_pool(urls, host.url_balancing, timeout)
+            for func_name, urls in urls_by_function.items()}
+
+# Histórico recente de CPU e RAM de um host para a previsão, em buffers circulares
+# numpy com uma amostra por `step` segundos. Só a thread de coleta escreve e lê
+class Metric_history:
+    __slots__ = ("timestamps", "cpu", "ram", "count", "step", "mode")
+
+    def __init__(self, size, step, mode):
+        self.timestamps = numpy.zeros(size)
+        self.cpu = numpy.zeros(size)
+        self.ram = numpy.zeros(size)
+        self.count = 0
+        self.step = step
+        self.mode = mode
+
+    # Início da próxima consulta: o histórico todo na primeira vez, depois só o que falta
+    def next_start(self, now):
+        if self.count == 0:
+            return now - len(self.timestamps) * self.step
+        return self.timestamps[(self.count - 1) % len(self.timestamps)] + self.step
+
+    # Acrescenta as amostras [(timestamp, valor)] de CPU e RAM com o mesmo timestamp
+    def extend(self, cpu_series, ram_series):
+        ram_by_ts = dict(ram_series)
+        size = len(self.timestamps)
+        last = self.timestamps[(self.count - 1) % size] if self.count else float('-inf')
+        for timestamp, cpu in cpu_series:
+            ram = ram_by_ts.get(timestamp)
+            if ram is None or timestamp <= last:
+                continue
+            index = self.count % size
+            self.timestamps[index] = timestamp
+            self.cpu[index] = cpu
+            self.ram[index] = ram
+            self.count += 1
+            last = timestamp
+
+    # Amostras em ordem cronológica
+    def series(self):
+        size = len(self.timestamps)
+        indexes = numpy.arange(max(0, self.count - size), self.count) % size
+        return self.timestamps[indexes], self.cpu[indexes], self.ram[indexes]
+
+    # CPU e RAM projetados para o instante `at`; inf se não há amostras recentes
+    def forecast(self, at):
+        timestamps, cpu, ram = self.series()
+        if not len(timestamps) or at - timestamps[-1] > len(self.timestamps) * self.step:
+            return float('inf'), float('inf')
+        project = forecast_holt if self.mode == "holt" else forecast_linear
+        return (min(100.0, max(0.0, project(timestamps, cpu, at))),
+                min(100.0, max(0.0, project(timestamps, ram, at))))
+
+# Tendência linear (mínimos quadrados) avaliada em `at`
+def forecast_linear(timestamps, values, at):
+    if len(values) < 2:
+        return float(values[-1])
+    slope, intercept = numpy.polyfit(timestamps - timestamps[-1], values, 1)
+    return float(intercept + slope * (at - timestamps[-1]))
+
+# Suavização exponencial dupla (Holt): nível + tendência por amostra, projetada até `at`
+def forecast_holt(timestamps, values, at):
+    if len(values) < 2:
+        return float(values[-1])
+    level, trend = values[0], values[1] - values[0]
+    for value in values[1:]:
+        previous = level
+        level = HOLT_ALPHA * value + (1 - HOLT_ALPHA) * (level + trend)
+        trend = HOLT_BETA * (level - previous) + (1 - HOLT_BETA) * trend
+    step = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
+    return float(level + trend * (at - timestamps[-1]) / step)
+
+# Cria a Slot_table de um host sobre `values` (a partir de `base`), None se sem limite
+def build_slot_table(host, values, base, timeout):
+    if not host.max_concurrent_total():
+        return None
+    return Slot_table(values, base, host.max_concurrent_total(), timeout, host.function_limits,
+                      bool(host.max_concurrent), next(slot_epochs))
+
+# Tabela de estado dos hosts em memória compartilhada (um array de doubles, SHM_FIELDS
+# por host seguidos das vagas de execução de cada um), criada antes do fork: o processo
+# de coleta escreve e todos os workers leem. Cada host tem um lock entre processos para
+# a reserva
+class Shared_host_table:
+    def __init__(self, hosts, ctx, timeout=IN_FLIGHT_TIMEOUT):
+        slots_size = sum(host.max_concurrent_total() * SLOT_FIELDS for host in hosts)
+        self.values = ctx.RawArray('d', len(hosts) * SHM_FIELDS + slots_size)
+        self.locks = [ctx.Lock() for _ in hosts]
+        self.slots = []
+        base = len(hosts) * SHM_FIELDS
+        for host in hosts:
+            self.slots.append(build_slot_table(host, self.values, base, timeout))
+            base += host.max_concurrent_total() * SLOT_FIELDS
+
+    def state(self, index):
+        return Shared_host_state(self, index)
+
+# Mesma interface de Host_state, mas lendo e escrevendo na Shared_host_table.
+# As métricas usam um contador de sequência (seqlock): o escritor deixa o contador
+# ímpar durante a escrita e o leitor repete a leitura se pegou uma escrita no meio
+# A latência observada fica em cada worker (só vê os relatos que ele recebeu)
+class Shared_host_state:
+    __slots__ = ("values", "base", "lock", "latency", "slots")
+
+    def __init__(self, table, index):
+        self.values = table.values
+        self.base = index * SHM_FIELDS
+        self.lock = table.locks[index]
+        self.latency = Latency_stats()
+        self.slots = table.slots[index]
+
+    @property
+    def metrics(self):
+        values, base = self.values, self.base
+        while True:
+            seq = values[base + SHM_SEQ]
+            if seq % 2 == 0:
+                metrics = Host_metrics(cpu_use=values[base + SHM_CPU],
+                                       ram_use=values[base + SHM_RAM],
+                                       timestamp=values[base + SHM_TIMESTAMP],
+                                       pushed=values[base + SHM_PUSHED] == 1)
+                if values[base + SHM_SEQ] == seq:
+                    return metrics
+            time.sleep(0)
+
+    @property
+    def last_use_ts(self):
+        return self.values[self.base + SHM_LAST_USE]
+
+    # Pushes chegam nos workers e a coleta no processo principal: o lock mantém um
+    # escritor por vez no seqlock
+    def publish(self, cpu_use, ram_use, pushed=False):
+        values, base = self.values, self.base
+        with self.lock:
+            values[base + SHM_SEQ] += 1
+            values[base + SHM_CPU] = cpu_use
+            values[base + SHM_RAM] = ram_use
+            values[base + SHM_TIMESTAMP] = time.time()
+            values[base + SHM_PUSHED] = 1 if pushed else 0
+            values[base + SHM_SEQ] += 1
+
+    def try_reserve(self, now, min_interval, slots=1, function_name=None):
+        acquire_timed(self.lock)
+        try:
+            if (now - self.values[self.base + SHM_LAST_USE]) < min_interval:
+                return None
+            ticket = ""
+            if self.slots is not None:
+                ticket = self.slots.acquire(now, function_name)
+                if ticket is None:
+                    return None
+            self.values[self.base + SHM_LAST_USE] = now + (slots - 1) * min_interval
+            return ticket
+        finally:
+            self.lock.release()
+
+    def release(self, ticket):
+        if self.slots is None:
+            return False
+        with self.lock:
+            return self.slots.release(ticket)
+
+    def mark_failed(self, until):
+        with self.lock:
+            last_use = self.values[self.base + SHM_LAST_USE]
+            self.values[self.base + SHM_LAST_USE] = max(last_use, until)
+
 # Classe para guardar informações de hosts na borda e nevoa
 @dataclass
 class Host_table_entry:
     __slots__ = ("name", "priority", "layer", "faas_urls", "prometheus_api_url",
-                 "max_cpu", "max_ram", "min_interval",
-                 "cpu_use", "ram_use", "last_use_ts")
-
-    name               : str
-    priority           : str
-    layer              : str
-    faas_urls          : list
-    prometheus_api_url : str
-    max_cpu            : float
-    max_ram            : float
-    min_interval       : float
-    cpu_use            : float
-    ram_use            : float
-    last_use_ts        : float
+                 "prometheus_instance", "max_cpu", "max_ram", "min_interval",
+                 "max_concurrent", "function_limits", "url_balancing", "url_pools", "history",
+                 "link", "state")
+
+    name                : str
+    priority            : str
+    layer               : str
+    faas_urls           : list
+    prometheus_api_url  : str
+    prometheus_instance : str
+    max_cpu             : float
+    max_ram             : float
+    min_interval        : float
+    max_concurrent      : int
+    function_limits     : dict
+    url_balancing       : str
+    url_pools           : dict
+    history             : Metric_history
+    link                : Link_stats
+    state               : Host_state
 
     def getname(self):               return self.name
     def getpriority(self):           return self.priority
     def getlayer(self):              return self.layer
     def getfaas_urls(self):          return self.faas_urls
     def getprometheus_api_url(self): return self.prometheus_api_url
+    def getprometheus_instance(self): return self.prometheus_instance
     def getmax_cpu(self):            return self.max_cpu
     def getmax_ram(self):            return self.max_ram
-    def getcpu_use(self):            return self.cpu_use
-    def getram_use(self):            return self.ram_use
+    def getcpu_use(self):            return self.state.metrics.cpu_use
+    def getram_use(self):            return self.state.metrics.ram_use
+
+    # Vagas de execução simultânea do host: max_concurrent ou, se só há limites por
+    # função, a soma deles (só as funções listadas ocupam vaga; 0 = sem limite)
+    def max_concurrent_total(self):
+        if self.max_concurrent:
+            return self.max_concurrent
+        return sum(cap for _, cap in self.function_limits.values())
+
+    @property
+    def cpu_use(self):     return self.state.metrics.cpu_use
+    @property
+    def ram_use(self):     return self.state.metrics.ram_use
+    @property
+    def last_use_ts(self): return self.state.last_use_ts
+
+# Visão imutável da configuração. O POST monta uma nova e troca a referência global de
+# uma vez, então o GET lê tudo de uma visão consistente sem pegar lock. config é o
+# config.yml carregado (dict) que gerou a visão, None se ela não veio de um POST
+@dataclass(frozen=True)
+class Host_view:
+    __slots__ = ("refresh", "hosts", "cloud_host", "settings", "function_index", "url_index",
+                 "host_index", "all_functions", "config")
+    refresh        : float
+    hosts          : tuple
+    cloud_host     : Cloud_layer
+    settings       : Server_settings
+    function_index : dict
+    url_index      : dict
+    host_index     : dict
+    all_functions  : list
+    config         : dict
 
 
 def parse_config(yaml_content):
@@ -54,33 +835,230 @@ def parse_config(yaml_content):
 
     yml_data = yaml.safe_load(yaml_content)
     refresh = yml_data.get('refresh_interval_secs')
+    settings = Server_settings(
+        scrape_deadline=yml_data.get('scrape_deadline_secs', SCRAPE_TIMEOUT),
+        lease_ttl=yml_data.get('lease_ttl_secs', 0),
+        lease_max_slots=yml_data.get('lease_max_slots', 1),
+        placement_policy=yml_data.get('placement_policy', 'first_fit'),
+        placement_weights=parse_weights(yml_data.get('placement_weights')),
+        in_flight_timeout=yml_data.get('in_flight_timeout_secs', IN_FLIGHT_TIMEOUT),
+        failure_backoff=yml_data.get('failure_backoff_secs', FAILURE_BACKOFF),
+        push_stale=yml_data.get('push_stale_secs', PUSH_STALE),
+        push_udp_port=yml_data.get('push_udp_port', 0),
+        adaptive_scrape=yml_data.get('adaptive_scrape', False),
+        scrape_min_interval=yml_data.get('scrape_min_interval_secs', SCRAPE_MIN_INTERVAL),
+        scrape_max_interval=yml_data.get('scrape_max_interval_secs', SCRAPE_MAX_INTERVAL),
+        result_cache_bytes=int(yml_data.get('result_cache_mb', 0) * 1024 * 1024),
+        result_cache_ttl=yml_data.get('result_cache_ttl_secs', RESULT_CACHE_TTL)
+    )
+    if settings.placement_policy not in PLACEMENT_POLICIES:
+        raise ValueError(f"placement_policy deve ser um de {tuple(PLACEMENT_POLICIES)}")
+    if PLACEMENT_POLICIES[settings.placement_policy].requires_numpy and numpy is None:
+        raise RuntimeError(f"A política {settings.placement_policy} precisa do numpy (pip install numpy).")
+    forecast_mode = yml_data.get('forecast_mode', 'off')
+    if forecast_mode is False:
+        # YAML 1.1 lê `forecast_mode: off` sem aspas como booleano
+        forecast_mode = "off"
+    forecast_window = yml_data.get('forecast_window_secs', FORECAST_WINDOW)
+    forecast_step = yml_data.get('forecast_step_secs', FORECAST_STEP)
+    if forecast_mode not in FORECAST_MODES:
+        raise ValueError(f"forecast_mode deve ser um de {FORECAST_MODES}")
+    if forecast_mode != "off" and numpy is None:
+        raise RuntimeError("A previsão (forecast_mode) precisa do numpy (pip install numpy).")
     hosts_dict = yml_data.get('hosts', {})
     
     for host, properties in hosts_dict.items():
         if (properties.get('layer')) != 'cloud':
+            # Limites por função: {nome: (código, máximo)}, código só identifica a função
+            # dentro das vagas do host
+            per_function = properties.get('max_concurrent_per_function') or {}
+            function_limits = {func_name: (code, cap)
+                               for code, (func_name, cap) in enumerate(per_function.items(), start=1)}
             entry = Host_table_entry(
                 name=host,
                 priority=properties.get('priority'),
                 layer=properties.get('layer'),
                 faas_urls=properties.get('faas_urls'),
                 prometheus_api_url=properties.get('prometheus_api_url'),
+                prometheus_instance=properties.get('prometheus_instance'),
                 max_cpu=properties.get('max_cpu_use'),
                 max_ram=properties.get('max_ram_use'),
                 min_interval=properties.get('min_req_interval_secs', 0),
-                cpu_use=0,
-                ram_use=0,
-                last_use_ts=0 
+                max_concurrent=properties.get('max_concurrent', 0),
+                function_limits=function_limits,
+                url_balancing=properties.get('url_balancing', 'least_outstanding'),
+                url_pools=None,
+                history=None,
+                link=Link_stats(properties.get('rtt_ms'), properties.get('bandwidth_mbps')),
+                state=None
             )
+            if entry.url_balancing not in URL_BALANCING:
+                raise ValueError(f"url_balancing do host {host} deve ser um de {URL_BALANCING}")
+            entry.url_pools = build_url_pools(entry, settings.in_flight_timeout)
+            if forecast_mode != "off":
+                # O histórico vem do query_range, ao lado do /query da consulta instantânea
+                if entry.prometheus_api_url and not entry.prometheus_api_url.endswith("/query"):
+                    raise ValueError(f"prometheus_api_url do host {host} deve terminar em /query "
+                                     "para usar forecast_mode")
+                entry.history = Metric_history(max(2, int(forecast_window // forecast_step)),
+                                               forecast_step, forecast_mode)
+            capacity = entry.max_concurrent_total()
+            entry.state = Host_state(build_slot_table(entry, array('d', bytes(8 * SLOT_FIELDS * capacity)),
+                                                      0, settings.in_flight_timeout))
             edge_fog_hosts_table.append(entry)
         else:
             cloud_host = Cloud_layer(
                 name=host,
                 layer=properties.get('layer'),
-                faas_urls=properties.get('faas_urls')
+                faas_urls=properties.get('faas_urls'),
+                latency=Latency_stats(),
+                link=Link_stats(properties.get('rtt_ms'), properties.get('bandwidth_mbps'))
             )
 
     sorted_hosts = sorted(edge_fog_hosts_table, key=lambda host: host.getpriority() == 'low')
-    return refresh, sorted_hosts, cloud_host
+    function_index = build_function_index(sorted_hosts, cloud_host, settings.push_stale)
+    return refresh, sorted_hosts, cloud_host, settings, function_index
+
+# placement_weights do config.yml: {cpu, ram, latency, priority}, o que faltar fica com o padrão
+def parse_weights(weights):
+    weights = {**PLACEMENT_WEIGHTS, **(weights or {})}
+    if weights.keys() != PLACEMENT_WEIGHTS.keys():
+        raise ValueError(f"placement_weights aceita só {tuple(PLACEMENT_WEIGHTS)}")
+    return tuple(float(weights[key]) for key in PLACEMENT_WEIGHTS)
+
+# Nome da função de uma url <URL>:<PORTA>/function/<NOME DA FUNÇÃO>
+def function_name_from_url(url):
+    return url.split('/')[-1]
+
+# Monta o índice {nome da função: Function_route}, assim a decisão só percorre os hosts
+# que têm a função. Cada host entra uma vez, com o Url_pool das suas urls para a função
+def build_function_index(sorted_hosts, cloud_host, push_stale=PUSH_STALE):
+    candidates = {}
+    for host in sorted_hosts:
+        for func_name, pool in host.url_pools.items():
+            candidates.setdefault(func_name, []).append((host, pool))
+
+    cloud_urls = {}
+    if cloud_host:
+        for url in cloud_host.getfaas_urls() or []:
+            cloud_urls.setdefault(function_name_from_url(url), url)
+
+    return {func_name: Function_route(candidates=tuple(candidates.get(func_name, ())),
+                                      cloud_url=cloud_urls.get(func_name),
+                                      cloud_host=cloud_host, arrays=None, cutoff_decisions=[0],
+                                      push_stale=push_stale)
+            for func_name in candidates.keys() | cloud_urls.keys()}
+
+# Monta os arrays do numpy das políticas (Host_arrays da visão e Route_arrays de cada
+# função) e liga o estado de cada host à sua linha, para publish e a latência relatada
+# escreverem nela. Sem numpy não faz nada (first_fit e latency seguem em laço)
+def build_policy_arrays(hosts, function_index, settings):
+    if numpy is None:
+        return
+    if hosts and all(isinstance(host.state, Shared_host_state) for host in hosts):
+        # Modo multi-worker: CPU/RAM lidas direto da memória compartilhada
+        values = numpy.frombuffer(hosts[0].state.values, dtype=numpy.float64, count=len(hosts) * SHM_FIELDS)
+        metrics = values.reshape(len(hosts), SHM_FIELDS)[:, SHM_CPU:SHM_RAM + 1]
+    else:
+        metrics = numpy.empty((len(hosts), 2))
+        for row, host in enumerate(hosts):
+            host.state.row = metrics[row]
+            metrics[row] = (host.state.metrics.cpu_use, host.state.metrics.ram_use)
+    latency = numpy.empty(len(hosts))
+    link = numpy.empty((len(hosts), 2))
+    for row, host in enumerate(hosts):
+        host.state.latency.row = latency[row:row + 1]
+        latency[row] = host.state.latency.expected()
+        host.link.row = link[row]
+        link[row] = (host.link.fixed, host.link.per_byte)
+    host_arrays = Host_arrays(metrics=metrics, latency=latency, link=link,
+                              weights=numpy.array(settings.placement_weights))
+
+    rows = {id(host): row for row, host in enumerate(hosts)}
+    for route in function_index.values():
+        hosts_in_route = [host for host, _ in route.candidates]
+        layers = list(dict.fromkeys(host.getlayer() for host in hosts_in_route))
+        route.arrays = Route_arrays(
+            hosts=host_arrays,
+            rows=numpy.array([rows[id(host)] for host in hosts_in_route], dtype=numpy.intp),
+            max_cpu=numpy.array([host.max_cpu for host in hosts_in_route], dtype=numpy.float64),
+            max_ram=numpy.array([host.max_ram for host in hosts_in_route], dtype=numpy.float64),
+            low_priority=numpy.array([host.getpriority() == 'low' for host in hosts_in_route], dtype=numpy.float64),
+            tiers=numpy.array([layers.index(host.getlayer()) for host in hosts_in_route], dtype=numpy.intp),
+            names=tuple(host.getname() for host in hosts_in_route),
+            turn=[0]
+        )
+
+# Monta o índice {url: host} usado para atribuir as latências relatadas pelos clientes
+def build_url_index(sorted_hosts, cloud_host):
+    url_index = {}
+    for host in sorted_hosts:
+        for url in host.getfaas_urls() or []:
+            url_index.setdefault(url, host)
+    if cloud_host:
+        for url in cloud_host.getfaas_urls() or []:
+            url_index.setdefault(url, cloud_host)
+    return url_index
+
+# Registra a latência (segundos) de uma invocação na url e, com o tamanho do payload
+# (bytes), também no enlace do host; False se a url não é conhecida
+def record_latency(url_index, url, latency, payload_bytes=None):
+    host = url_index.get(url)
+    if host is None:
+        return False
+    stats = host.latency if isinstance(host, Cloud_layer) else host.state.latency
+    stats.add(latency)
+    if payload_bytes is not None:
+        host.link.add(payload_bytes, latency)
+    return True
+
+# Percentil (0-100) da latência observada na url, None se não há amostras
+def url_latency_percentile(url_index, url, q):
+    host = url_index.get(url)
+    if host is None:
+        return None
+    stats = host.latency if isinstance(host, Cloud_layer) else host.state.latency
+    return stats.percentile(q)
+
+# Libera a vaga de execução (ticket) ocupada na url quando o cliente confirma o fim
+def release_ticket(url_index, url, ticket):
+    host = url_index.get(url)
+    if host is None or isinstance(host, Cloud_layer):
+        return False
+    return host.state.release(ticket)
+
+# Url_pool da url num host da borda/névoa, None para a nuvem ou url desconhecida
+def url_pool_for(url_index, url):
+    host = url_index.get(url)
+    if host is None or isinstance(host, Cloud_layer):
+        return None
+    return host.url_pools.get(function_name_from_url(url))
+
+# Tira da escolha, por `backoff` segundos, a url que falhou; o host inteiro só sai quando
+# nenhuma das suas urls para a função está saudável (a nuvem não sai)
+def mark_failed(url_index, url, backoff):
+    pool = url_pool_for(url_index, url)
+    if pool is None:
+        return False
+    until = time.time() + backoff
+    if not pool.mark_failed(url, until):
+        url_index[url].state.mark_failed(until)
+    return True
+
+# Aplica um relato do cliente: latência (None se não medida), ticket, falha e tamanho do
+# payload enviado (None se não informado). Todo relato encerra uma invocação em andamento na url
+def apply_report(url_index, url, latency, ticket, failed=False, backoff=0, payload_bytes=None):
+    pool = url_pool_for(url_index, url)
+    if pool is not None:
+        pool.release(url)
+    recorded = False
+    if latency is not None:
+        recorded = record_latency(url_index, url, latency, payload_bytes)
+    if ticket:
+        release_ticket(url_index, url, ticket)
+    if failed:
+        mark_failed(url_index, url, backoff)
+    return recorded
 
 
 def unpack_response(response):
@@ -91,84 +1069,844 @@ def unpack_response(response):
         return float('inf')
     return response_value
 
+# Resposta de uma consulta com vários hosts: {label instance: valor}
+def unpack_response_by_instance(response):
+    values = {}
+    try:
+        response_content_json = json.loads(response.content)
+        for result in response_content_json['data']['result']:
+            values[result['metric']['instance']] = float(result['value'][1])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return values
+    return values
+
+
+# Resposta de uma consulta de intervalo (query_range): {label instance: [(timestamp, valor)]}
+# ou, com by_instance=False, a série da primeira métrica. Valores NaN/inf são descartados
+def unpack_range_response(response, by_instance):
+    series = {}
+    try:
+        response_content_json = json.loads(response.content)
+        for result in response_content_json['data']['result']:
+            samples = [(float(timestamp), float(value)) for timestamp, value in result['values']]
+            series[result['metric'].get('instance')] = [(timestamp, value) for timestamp, value in samples
+                                                        if math.isfinite(value)]
+    except (KeyError, IndexError, TypeError, ValueError):
+        pass
+    if by_instance:
+        return series
+    return next(iter(series.values()), [])
+
+# Sessão com conexões keep-alive para os Prometheus, compartilhada pelas threads de coleta
+# (um pool por servidor, com conexões suficientes para as consultas paralelas de CPU e RAM)
+prometheus_session = requests.Session()
+prometheus_session.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=8))
+prometheus_session.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=8))
+
+# Faz uma consulta ao Prometheus, retorna o valor e o tempo gasto
+# Com by_instance=True o valor é um dict {instance: valor} com todos os hosts da resposta
+def fetch_metric(prometheus_api_url, query, by_instance=False, timeout=SCRAPE_TIMEOUT):
+    start = time.monotonic()
+    try:
+        response = prometheus_session.get(prometheus_api_url, params={'query': query}, timeout=timeout)
+        response.raise_for_status()
+        value = unpack_response_by_instance(response) if by_instance else unpack_response(response)
+    except requests.exceptions.RequestException:
+        value = {} if by_instance else float('inf')
+    return value, time.monotonic() - start
+
+# Como fetch_metric, mas com o histórico de `start` até `end` (endpoint query_range, ao
+# lado do /query, ver parse_config)
+def fetch_metric_range(prometheus_api_url, query, start, end, step, by_instance=False,
+                       timeout=SCRAPE_TIMEOUT):
+    started = time.monotonic()
+    try:
+        response = prometheus_session.get(prometheus_api_url + "_range", params={'query': query, 'start': start, 'end': end,
+                                                             'step': step}, timeout=timeout)
+        response.raise_for_status()
+        value = unpack_range_response(response, by_instance)
+    except requests.exceptions.RequestException:
+        value = {} if by_instance else []
+    return value, time.monotonic() - started
+
+# Registra a coleta de um host em /metrics (duration None: estourou o prazo)
+def record_scrape(name, duration, cpu_use=float('inf'), ram_use=float('inf')):
+    labels = (("host", name),)
+    if duration is None:
+        server_metrics.inc("adapt_scrape_errors_total", labels + (("reason", "timeout"),))
+        return
+    server_metrics.observe("adapt_scrape_duration_seconds", duration, labels)
+    if not (math.isfinite(cpu_use) and math.isfinite(ram_use)):
+        server_metrics.inc("adapt_scrape_errors_total", labels + (("reason", "no_data"),))
 
+# Host com histórico (forecast_mode): acrescenta as séries coletadas [(timestamp, valor)]
+# e retorna CPU e RAM previstos para o instante `at`
+def forecast_scraped(host, cpu_series, ram_series, at):
+    host.history.extend(cpu_series, ram_series)
+    return host.history.forecast(at)
 
+# Publica as métricas coletadas, a menos que o host tenha enviado as dele há pouco
+def publish_scraped(host, cpu_use, ram_use, now, push_stale):
+    metrics = host.state.metrics
+    if metrics.pushed and now - metrics.timestamp < push_stale:
+        return
+    host.state.publish(cpu_use, ram_use)
+
+# Métricas enviadas pelo host `name` (push); False se o host ou os valores não valem
+def ingest_push(view, name, cpu_use, ram_use):
+    host = view.host_index.get(name)
+    if host is None:
+        return False
+    try:
+        cpu_use, ram_use = float(cpu_use), float(ram_use)
+    except (TypeError, ValueError):
+        return False
+    if not (math.isfinite(cpu_use) and math.isfinite(ram_use)):
+        return False
+    host.state.publish(cpu_use, ram_use, pushed=True)
+    return True
+
+# Datagrama UDP de push: uma linha "<host> <cpu %> <ram %>" por host
+def ingest_datagram(view, datagram):
+    accepted = 0
+    for line in datagram.decode('utf-8', 'replace').splitlines():
+        fields = line.split()
+        if len(fields) == 3:
+            accepted += ingest_push(view, *fields)
+    return accepted
+
+# Agrupa os hosts por consulta a ser feita: hosts com `prometheus_instance` que usam o
+# mesmo Prometheus (compartilhado/federado) são atendidos por uma única consulta por
+# métrica; os demais continuam com uma consulta própria
+def group_scrape_targets(hosts_table):
+    batched = {}
+    single = []
+    for host in hosts_table:
+        if not host.getprometheus_api_url():
+            continue
+        if host.getprometheus_instance():
+            batched.setdefault(host.getprometheus_api_url(), []).append(host)
+        else:
+            single.append(host)
+    targets = [(url, hosts, True) for url, hosts in batched.items()]
+    targets.extend((host.getprometheus_api_url(), [host], False) for host in single)
+    return targets
 
 # Função que apenas coleta métricas (Lenta, roda na thread)
-def update_metrics_routine(hosts_table, query_cpu, query_ram):
+# Todas as consultas (CPU e RAM de todos os hosts) são feitas em paralelo, então o ciclo
+# custa o tempo do host mais lento, limitado por `deadline`. Host que não responde dentro
+# do prazo fica como indisponível (inf) até o próximo ciclo.
+# Hosts com histórico (forecast_mode) puxam as amostras novas com query_range e publicam
+# a previsão para daqui a `horizon` segundos em vez do último valor.
+# Host que enviou métricas (push) há menos de `push_stale` segundos mantém as dele; host
+# sem prometheus_api_url só tem push e fica indisponível quando o push para.
+# Retorna o tempo de coleta de cada host (None se estourou o prazo)
+def update_metrics_routine(hosts_table, query_cpu, query_ram, deadline=SCRAPE_TIMEOUT, horizon=0,
+                           push_stale=PUSH_STALE):
+    durations = {}
+    now = time.time()
     for host in hosts_table:
-        prometheus_api_url = host.getprometheus_api_url()
-        try:
-            cpu_response = requests.get(prometheus_api_url, params={'query': query_cpu}, timeout=5)
-            ram_response = requests.get(prometheus_api_url, params={'query': query_ram}, timeout=5)
-            cpu_response.raise_for_status()
-            ram_response.raise_for_status()
-            
-            host.cpu_use = unpack_response(cpu_response)
-            host.ram_use = unpack_response(ram_response)
-        except requests.exceptions.RequestException:
-            host.cpu_use = float('inf')
-            host.ram_use = float('inf')
+        if not host.getprometheus_api_url():
+            publish_scraped(host, float('inf'), float('inf'), now, push_stale)
 
-# Função de decisão (Rápida, roda a cada request)
-def select_best_host(edge_fog_hosts_table, cloud_host, function_name):
-    
-    def get_url_for_function(host, func_name):
-        for url in host.getfaas_urls():
-            if url.endswith(f"/{func_name}"):
-                return url
-        return None
+    targets = group_scrape_targets(hosts_table)
+    if not targets:
+        return durations
 
-    # Percorre a lista (já ordenada por prioridade)
-    for host in edge_fog_hosts_table:
-        url = get_url_for_function(host, function_name)
-        if not url:
-            continue # Host não tem essa função
+    executor = ThreadPoolExecutor(max_workers=2 * len(targets))
+    futures = []
+    for prometheus_api_url, hosts, by_instance in targets:
+        if hosts[0].history is not None:
+            # Ciclo mais curto que o passo: pelo menos a amostra de agora
+            start = min(now, min(host.history.next_start(now) for host in hosts))
+            step = hosts[0].history.step
+            futures.append((hosts, by_instance,
+                            executor.submit(fetch_metric_range, prometheus_api_url, query_cpu, start, now,
+                                            step, by_instance),
+                            executor.submit(fetch_metric_range, prometheus_api_url, query_ram, start, now,
+                                            step, by_instance)))
+            continue
+        futures.append((hosts, by_instance,
+                        executor.submit(fetch_metric, prometheus_api_url, query_cpu, by_instance),
+                        executor.submit(fetch_metric, prometheus_api_url, query_ram, by_instance)))
+
+    wait([f for _, _, cpu_f, ram_f in futures for f in (cpu_f, ram_f)], timeout=deadline)
+    # Não espera consultas atrasadas, elas terminam sozinhas (timeout do requests)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for hosts, by_instance, cpu_future, ram_future in futures:
+        if not (cpu_future.done() and ram_future.done()):
+            for host in hosts:
+                publish_scraped(host, float('inf'), float('inf'), now, push_stale)
+                durations[host.getname()] = None
+                record_scrape(host.getname(), None)
+            continue
 
-        # Verifica métricas (já atualizadas pela thread)
-        cpu_ok = host.cpu_use < host.max_cpu
-        ram_ok = host.ram_use < host.max_ram
-        
-        # Verifica tempo AGORA (Crucial para sua correção)
+        cpu_value, cpu_time = cpu_future.result()
+        ram_value, ram_time = ram_future.result()
+        for host in hosts:
+            if host.history is not None:
+                cpu_series, ram_series = cpu_value, ram_value
+                if by_instance:
+                    cpu_series = cpu_value.get(host.getprometheus_instance(), [])
+                    ram_series = ram_value.get(host.getprometheus_instance(), [])
+                cpu_use, ram_use = forecast_scraped(host, cpu_series, ram_series, time.time() + horizon)
+            elif by_instance:
+                # Host ausente da resposta é tratado como indisponível
+                cpu_use = cpu_value.get(host.getprometheus_instance(), float('inf'))
+                ram_use = ram_value.get(host.getprometheus_instance(), float('inf'))
+            else:
+                cpu_use, ram_use = cpu_value, ram_value
+            publish_scraped(host, cpu_use, ram_use, now, push_stale)
+            durations[host.getname()] = max(cpu_time, ram_time)
+            record_scrape(host.getname(), durations[host.getname()], cpu_use, ram_use)
+    return durations
+
+# Agenda da coleta adaptativa de uma visão: fila de prioridade (heap) com o próximo
+# horário de coleta de cada host. A cada passo coleta só os hosts vencidos (em paralelo,
+# como update_metrics_routine) e reagenda cada um conforme a folga até os limites e a
+# velocidade com que as métricas mudam
+class Scrape_scheduler:
+    def __init__(self, view):
+        self.view = view
+        self.queue = [(0, index, host) for index, host in enumerate(view.hosts)]
+        self.last = {}
+        self.intervals = {}
+
+    # Intervalo até a próxima coleta do host, pelas métricas que acabaram de ser publicadas
+    def next_interval(self, host, now):
+        settings = self.view.settings
+        metrics = host.state.metrics
+        previous = self.last.get(host.getname())
+        self.last[host.getname()] = (now, metrics.cpu_use, metrics.ram_use)
+
+        if not (math.isfinite(metrics.cpu_use) and math.isfinite(metrics.ram_use)):
+            # Fora do ar: recua dobrando o intervalo
+            interval = 2 * max(self.view.refresh, self.intervals.get(host.getname(), 0))
+        else:
+            # Acima do limite não há folga: coleta no intervalo mínimo para notar quando voltar
+            headroom = max(0.0, min(host.max_cpu - metrics.cpu_use, host.max_ram - metrics.ram_use))
+            interval = self.view.refresh * headroom / ADAPTIVE_HEADROOM
+            if previous is not None and math.isfinite(previous[1]) and math.isfinite(previous[2]):
+                change = max(abs(metrics.cpu_use - previous[1]), abs(metrics.ram_use - previous[2]))
+                rate = change / max(now - previous[0], 1e-3)
+                if rate > 0:
+                    # Coleta de novo antes de a tendência atual chegar ao limite
+                    interval = min(interval, headroom / rate / 2)
+
+        interval = min(settings.scrape_max_interval, max(settings.scrape_min_interval, interval))
+        self.intervals[host.getname()] = interval
+        return interval
+
+    # Coleta os hosts vencidos e os reagenda; retorna os tempos de coleta deles
+    def step(self):
         now = time.time()
-        time_ok = (now - host.last_use_ts) >= host.min_interval
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            due.append(heapq.heappop(self.queue))
+        if not due:
+            return {}
 
-        if cpu_ok and ram_ok and time_ok:
-            host.last_use_ts = now # Marca uso IMEDIATAMENTE
-            return url
+        settings = self.view.settings
+        durations = update_metrics_routine([host for _, _, host in due], QUERY_CPU, QUERY_RAM,
+                                           settings.scrape_deadline, self.view.refresh,
+                                           settings.push_stale)
+        now = time.time()
+        for _, index, host in due:
+            heapq.heappush(self.queue, (now + self.next_interval(host, now), index, host))
+        return durations
 
-    # Fallback para nuvem
-    if cloud_host:
-        cloud_url = get_url_for_function(cloud_host, function_name)
-        if cloud_url:
-            return cloud_url
-            
+    # Quanto dormir até o próximo host vencer (no máximo o intervalo mínimo, para notar
+    # uma configuração nova)
+    def wait_time(self):
+        if not self.queue:
+            return self.view.settings.scrape_min_interval
+        return max(0, min(self.queue[0][0] - time.time(), self.view.settings.scrape_min_interval))
+
+# Quantos usos de um host cabem num lease de `ttl` segundos. Num host com intervalo mínimo
+# os usos são reservados espaçados pelo intervalo (try_reserve) e o cliente os espaça do
+# mesmo jeito (interval_secs no lease), então só cabem os que terminam dentro do ttl. Host
+# com limite de execuções simultâneas não dá lease: cada uso precisa da sua vaga
+def lease_slots_for(host, max_slots, ttl):
+    if host.state.slots is not None:
+        return 1
+    if max_slots <= 1 or host.min_interval <= 0:
+        return max_slots
+    return max(1, min(max_slots, int(ttl // host.min_interval)))
+
+# Políticas de escolha de host (placement_policy). Cada uma recebe os arrays dos
+# candidatos da função (Route_arrays), as posições dos que estão abaixo dos limites de
+# CPU/RAM (em ordem de prioridade), a CPU/RAM de todos e o tamanho do payload (bytes, 0 se
+# o cliente não informou), e devolve essas posições na ordem em que devem ser tentadas,
+# tudo com operações do numpy, sem laço por host. O primeiro da ordem que aceitar
+# a reserva (intervalo mínimo, vagas) é o escolhido; sem nenhum, a nuvem.
+# Políticas novas entram com register_policy(nome, política) antes de carregar o config.yml
+class Placement_policy:
+    # Sem numpy só as políticas com requires_numpy False funcionam (em laço)
+    requires_numpy = True
+    # Hosts com latência esperada (expected) maior que a da nuvem ficam de fora
+    cloud_cutoff = False
+    # Decisão em lote (count=N) reveza as posições entre os hosts aceitos da primeira
+    # camada em vez de dar todas as restantes ao primeiro
+    spread_batch = False
+
+    def order(self, arrays, eligible, metrics, payload_bytes):
+        raise NotImplementedError
+
+    # Chamado depois de order() só nas decisões que reservam (não nas alternativas de
+    # hedge/failover), para políticas com estado entre decisões
+    def advance(self, arrays):
+        pass
+
+    # Latência esperada de um host ou da nuvem (Latency_stats e Link_stats dele): corte
+    # pela nuvem e ordem sem numpy
+    def expected(self, latency, link, payload_bytes):
+        return latency.expected()
+
+    # O mesmo para todos os candidatos da rota, na ordem de Function_route.candidates
+    def expected_array(self, arrays, payload_bytes):
+        return arrays.hosts.latency.take(arrays.rows)
+
+# Posições aptas em ordem crescente de score(aptas); empate mantém a prioridade
+def order_by_score(eligible, score):
+    return eligible[numpy.argsort(score(eligible), kind='stable')]
+
+# Primeiro host (em ordem de prioridade) abaixo dos limites
+class First_fit_policy(Placement_policy):
+    requires_numpy = False
+
+    def order(self, arrays, eligible, metrics, payload_bytes):
+        return eligible
+
+# Maior folga: menor uso de CPU ou RAM (o maior dos dois) como fração do limite do host
+class Least_loaded_policy(Placement_policy):
+    def order(self, arrays, eligible, metrics, payload_bytes):
+        return order_by_score(eligible, lambda rows: numpy.maximum(metrics[rows, 0] / arrays.max_cpu[rows],
+                                                                     metrics[rows, 1] / arrays.max_ram[rows]))
+
+# Menor soma ponderada (placement_weights) de CPU e RAM (fração do limite), latência
+# esperada (segundos) e prioridade baixa
+class Weighted_policy(Placement_policy):
+    def order(self, arrays, eligible, metrics, payload_bytes):
+        cpu, ram, latency, priority = arrays.hosts.weights
+
+        def score(rows):
+            return (cpu * metrics[rows, 0] / arrays.max_cpu[rows] + ram * metrics[rows, 1] / arrays.max_ram[rows]
+                    + latency * arrays.hosts.latency[arrays.rows[rows]] + priority * arrays.low_priority[rows])
+        return order_by_score(eligible, score)
+
+# Menor latência esperada primeiro; hosts mais lentos que a nuvem nem são tentados
+class Latency_policy(Placement_policy):
+    requires_numpy = False
+    cloud_cutoff = True
+
+    def order(self, arrays, eligible, metrics, payload_bytes):
+        return order_by_score(eligible, lambda rows: arrays.hosts.latency[arrays.rows[rows]])
+
+# Menor tempo estimado para enviar o payload e executar (Link_stats): um payload grande
+# fica no host da rede local mesmo que a nuvem execute mais rápido. Sem o tamanho do
+# payload vale só a parte fixa (RTT + execução)
+class Transfer_policy(Latency_policy):
+    def order(self, arrays, eligible, metrics, payload_bytes):
+        return order_by_score(eligible, lambda rows: self.expected_array(arrays, payload_bytes)[rows])
+
+    def expected(self, latency, link, payload_bytes):
+        return link.expected(payload_bytes)
+
+    def expected_array(self, arrays, payload_bytes):
+        link = arrays.hosts.link.take(arrays.rows, axis=0)
+        return link[:, 0] + payload_bytes * link[:, 1]
+
+# Reveza entre os hosts aptos da primeira camada (na ordem de prioridade) que tem algum
+# host apto; os demais aptos ficam depois, caso a reserva falhe
+class Round_robin_policy(Placement_policy):
+    spread_batch = True
+
+    def order(self, arrays, eligible, metrics, payload_bytes):
+        if not len(eligible):
+            return eligible
+        tiers = arrays.tiers[eligible]
+        in_tier = tiers == tiers.min()
+        first = eligible[in_tier]
+        first = numpy.roll(first, -(arrays.turn[0] % len(first)))
+        return numpy.concatenate((first, eligible[~in_tier]))
+
+    def advance(self, arrays):
+        arrays.turn[0] += 1
+
+PLACEMENT_POLICIES = {
+    "first_fit": First_fit_policy(),
+    "least_loaded": Least_loaded_policy(),
+    "weighted": Weighted_policy(),
+    "latency": Latency_policy(),
+    "transfer": Transfer_policy(),
+    "round_robin": Round_robin_policy(),
+}
+
+def register_policy(name, policy):
+    PLACEMENT_POLICIES[name] = policy
+
+# Labels dos candidatos recusados numa decisão vetorizada, calculados na coleta de /metrics
+def rejection_labels(arrays, metrics, eligible):
+    for position in numpy.flatnonzero(~eligible).tolist():
+        if metrics[position, 0] >= arrays.max_cpu[position]:
+            reason = "cpu"
+        elif metrics[position, 1] >= arrays.max_ram[position]:
+            reason = "ram"
+        else:
+            reason = "latency"
+        yield (("host", arrays.names[position]), ("reason", reason))
+
+# Candidatos na ordem em que a política quer tentá-los, sem os que estão acima dos limites
+# de CPU/RAM nem os mais lentos que a nuvem (cloud_cutoff), exceto a cada
+# LATENCY_PROBE_EVERY decisões, quando estes vão na frente.
+# payload_bytes: tamanho do payload informado pelo cliente.
+# record: conta em /metrics os hosts recusados pelos limites (e pela nuvem mais rápida),
+# todos os da rota nos dois caminhos (numpy e laço); os recusados depois, ao serem
+# tentados (stale, interval, slots), são contados por quem percorre os candidatos
+def ordered_candidates(route, policy, record=True, payload_bytes=0):
+    placement = PLACEMENT_POLICIES[policy]
+    cloud_expected = float('inf')
+    probe = False
+    if placement.cloud_cutoff and route.cloud_url and route.cloud_host:
+        cloud_expected = placement.expected(route.cloud_host.latency, route.cloud_host.link, payload_bytes)
+        if record:
+            route.cutoff_decisions[0] += 1
+            probe = route.cutoff_decisions[0] % LATENCY_PROBE_EVERY == 0
+
+    arrays = route.arrays
+    if arrays is None:
+        # Sem numpy: first_fit na ordem de prioridade, latency/transfer ordenando em Python
+        candidates = []
+        slower = []
+        if not placement.cloud_cutoff:
+            for candidate in route.candidates:
+                reason = limits_rejection(candidate[0], candidate[0].state.metrics)
+                if reason is None:
+                    candidates.append(candidate)
+                elif record:
+                    count_rejection(candidate[0], reason)
+            return candidates
+        expected = {id(host): placement.expected(host.state.latency, host.link, payload_bytes)
+                    for host, _ in route.candidates}
+        for candidate in sorted(route.candidates, key=lambda candidate: expected[id(candidate[0])]):
+            reason = limits_rejection(candidate[0], candidate[0].state.metrics)
+            if reason is not None:
+                if record:
+                    count_rejection(candidate[0], reason)
+                continue
+            if expected[id(candidate[0])] > cloud_expected:
+                if probe:
+                    slower.append(candidate)
+                elif record:
+                    count_rejection(candidate[0], "latency")
+                continue
+            candidates.append(candidate)
+        return slower + candidates
+
+    metrics = arrays.hosts.metrics.take(arrays.rows, axis=0)
+    under = (metrics[:, 0] < arrays.max_cpu) & (metrics[:, 1] < arrays.max_ram)
+    slower = None
+    if cloud_expected != float('inf'):
+        slower = placement.expected_array(arrays, payload_bytes) > cloud_expected
+        if not probe:
+            under &= ~slower
+    eligible = numpy.flatnonzero(under)
+    if record and len(eligible) < len(under):
+        server_metrics.inc_deferred("adapt_host_rejected_total", rejection_labels, arrays, metrics, under)
+
+    order = placement.order(arrays, eligible, metrics, payload_bytes)
+    if probe:
+        # Os mais lentos que a nuvem na frente, mantendo a ordem da política entre eles
+        order = numpy.concatenate((order[slower[order]], order[~slower[order]]))
+    if record:
+        placement.advance(arrays)
+    # Só os candidatos percorridos até a escolha viram tupla (host, Url_pool)
+    return map(route.candidates.__getitem__, order.tolist())
+
+# Conta um host pulado na decisão, com o motivo
+def count_rejection(host, reason):
+    server_metrics.inc("adapt_host_rejected_total", (("host", host.getname()), ("reason", reason)))
+
+# Motivo de o host recusar o uso: intervalo mínimo ainda não passou ou sem vaga
+def count_reserve_rejection(host, now):
+    count_rejection(host, "interval" if (now - host.state.last_use_ts) < host.min_interval else "slots")
+
+# Motivo de as métricas do host o recusarem, None se ele está abaixo dos limites. Push
+# mais velho que push_stale conta como indisponível: a coleta só o substitui no próximo
+# ciclo, e até lá um host que parou de enviar pareceria livre
+def metrics_rejection(host, metrics, now, push_stale):
+    if metrics.pushed and now - metrics.timestamp >= push_stale:
+        return "stale"
+    return limits_rejection(host, metrics)
+
+# Motivo de o host estar acima dos limites, na mesma precedência de rejection_labels
+def limits_rejection(host, metrics):
+    if metrics.cpu_use >= host.max_cpu:
+        return "cpu"
+    if metrics.ram_use >= host.max_ram:
+        return "ram"
     return None
 
+def count_selection(host):
+    server_metrics.inc("adapt_host_selected_total", (("host", host.getname()),))
+
+# Função de decisão com lease: além da url retorna quantos usos foram reservados
+# no host escolhido (até `max_slots` dentro de `ttl` segundos, ver lease_slots_for) e o
+# ticket da vaga de execução ocupada ("" se o host não limita execuções simultâneas).
+# A nuvem não dá lease: prenderia o cliente nela mesmo depois de um host liberar
+def select_best_lease(function_index, function_name, max_slots=1, ttl=0, policy="first_fit", payload_bytes=0):
+    route = function_index.get(function_name)
+    if route is None:
+        return None, 0, "" # Nenhum host tem essa função
+
+    # Tempo AGORA (Crucial para sua correção)
+    now = time.time()
+    candidates = ordered_candidates(route, policy, payload_bytes=payload_bytes)
+
+    # Percorre os candidatos (ordenados pela política)
+    for host, pool in candidates:
+        # Verifica métricas (snapshot publicado pela thread)
+        reason = metrics_rejection(host, host.state.metrics, now, route.push_stale)
+        if reason is not None:
+            count_rejection(host, reason)
+            continue
+
+        # Verifica tempo e vaga e marca uso IMEDIATAMENTE, só com o lock do host
+        slots = lease_slots_for(host, max_slots, ttl)
+        ticket = host.state.try_reserve(now, host.min_interval, slots, function_name)
+        if ticket is not None:
+            count_selection(host)
+            return pool.pick(now), slots, ticket
+        count_reserve_rejection(host, now)
+
+    # Fallback para nuvem
+    if route.cloud_url:
+        server_metrics.inc("adapt_cloud_fallback_total")
+        return route.cloud_url, 1, ""
+    return None, 0, ""
+
+# Função de decisão (Rápida, roda a cada request)
+# Com max_concurrent a vaga ocupada só é liberada quando expira (use select_best_lease
+# para obter o ticket e liberar com release_ticket)
+def select_best_host(function_index, function_name, policy="first_fit", payload_bytes=0):
+    return select_best_lease(function_index, function_name, policy=policy, payload_bytes=payload_bytes)[0]
+
+# Decisão em lote: reserva `count` posições numa única passada pelos candidatos.
+# Equivale a `count` chamadas de select_best_host no mesmo instante: cada host com
+# intervalo mínimo recebe no máximo uma, host sem intervalo mínimo recebe todas as
+# restantes (ou até acabarem suas vagas) e o que sobrar vai para a nuvem. Com spread_batch
+# (round_robin) as restantes são revezadas entre os hosts sem intervalo mínimo aceitos na
+# mesma camada, antes de passar à camada seguinte.
+# Retorna as urls e os tickets das vagas ocupadas, na mesma ordem
+def select_best_hosts(function_index, function_name, count, policy="first_fit", payload_bytes=0):
+    route = function_index.get(function_name)
+    if route is None:
+        return [], []
+
+    now = time.time()
+    spread = PLACEMENT_POLICIES[policy].spread_batch
+    candidates = ordered_candidates(route, policy, payload_bytes=payload_bytes)
+    urls = []
+    tickets = []
+    rotation = []
+
+    # Uma posição por vez para cada host da rotação, até completar ou todos recusarem
+    def rotate():
+        while rotation and len(urls) < count:
+            for entry in list(rotation):
+                if len(urls) >= count:
+                    break
+                host, pool = entry
+                ticket = host.state.try_reserve(now, 0, 1, function_name)
+                if ticket is None:
+                    rotation.remove(entry)
+                    continue
+                urls.append(pool.pick(now))
+                tickets.append(ticket)
+        rotation.clear()
+
+    for host, pool in candidates:
+        if rotation and host.getlayer() != rotation[0][0].getlayer():
+            rotate()
+        if len(urls) >= count:
+            break
+
+        reason = metrics_rejection(host, host.state.metrics, now, route.push_stale)
+        if reason is not None:
+            count_rejection(host, reason)
+            continue
+
+        ticket = host.state.try_reserve(now, host.min_interval, 1, function_name)
+        if ticket is None:
+            count_reserve_rejection(host, now)
+            continue
+        count_selection(host)
+        urls.append(pool.pick(now))
+        tickets.append(ticket)
+        if host.min_interval > 0:
+            continue
+        if spread:
+            rotation.append((host, pool))
+            continue
+
+        if host.state.slots is None:
+            tickets.extend([""] * (count - len(urls)))
+            urls.extend(pool.pick(now) for _ in range(count - len(urls)))
+        else:
+            while len(urls) < count:
+                ticket = host.state.try_reserve(now, 0, 1, function_name)
+                if ticket is None:
+                    break
+                urls.append(pool.pick(now))
+                tickets.append(ticket)
+    rotate()
+
+    # Fallback para nuvem
+    if route.cloud_url and len(urls) < count:
+        server_metrics.inc("adapt_cloud_fallback_total")
+        tickets.extend([""] * (count - len(urls)))
+        urls.extend([route.cloud_url] * (count - len(urls)))
+    return urls, tickets
+
+# Alternativas a `best_url` para o cliente usar se ela demorar (hedge) ou falhar
+# (failover): os próximos candidatos que seriam aceitos agora, na ordem da política, e a
+# nuvem por último. Não reservam uso, só são usadas quando a primeira invocação atrasa ou
+# falha; hosts com limite de execuções simultâneas ficam de fora, pois cada uso precisa
+# de um ticket
+def alternative_candidates(function_index, function_name, best_url, count, policy="first_fit",
+                           payload_bytes=0):
+    route = function_index.get(function_name)
+    if route is None:
+        return []
+
+    now = time.time()
+    candidates = ordered_candidates(route, policy, record=False, payload_bytes=payload_bytes)
+    urls = []
+    for host, pool in candidates:
+        if len(urls) >= count:
+            break
+        if best_url in pool.urls or host.state.slots is not None:
+            continue
+
+        if metrics_rejection(host, host.state.metrics, now, route.push_stale) is not None:
+            continue
+        if (now - host.state.last_use_ts) < host.min_interval:
+            continue
+        urls.append(pool.peek(now))
+
+    if route.cloud_url and route.cloud_url != best_url and len(urls) < count:
+        urls.append(route.cloud_url)
+    return urls
+
 def get_all_function_names(edge_fog_hosts, cloud_host):
     all_urls = []
     for host in edge_fog_hosts:
         all_urls.extend(host.getfaas_urls())
     if cloud_host:
         all_urls.extend(cloud_host.getfaas_urls())
-    func_names = {url.split('/')[-1] for url in all_urls}
+    func_names = {function_name_from_url(url) for url in all_urls}
     return list(func_names)
 
 
 app = Flask(__name__)
 
 # Variáveis globais
-edge_fog_hosts_table = []
-cloud_host = None
-refresh_time = 15
-# Lock para proteger a tabela de hosts (Thread escreve CPU/RAM, Flask lê e escreve Timestamp)
+# Visão atual da configuração, trocada inteira pelo POST (leitura sem lock)
+host_view = Host_view(refresh=15, hosts=(), cloud_host=None,
+                      settings=Server_settings(scrape_deadline=SCRAPE_TIMEOUT,
+                                               lease_ttl=0, lease_max_slots=1,
+                                               placement_policy="first_fit",
+                                               placement_weights=parse_weights(None),
+                                               in_flight_timeout=IN_FLIGHT_TIMEOUT,
+                                               failure_backoff=FAILURE_BACKOFF,
+                                               push_stale=PUSH_STALE, push_udp_port=0,
+                                               adaptive_scrape=False,
+                                               scrape_min_interval=SCRAPE_MIN_INTERVAL,
+                                               scrape_max_interval=SCRAPE_MAX_INTERVAL,
+                                               result_cache_bytes=0, result_cache_ttl=RESULT_CACHE_TTL),
+                      function_index={}, url_index={}, host_index={}, all_functions=[], config=None)
+# Lock apenas para quem escreve a visão (POST de configuração)
 data_lock = Lock() 
 config_received_event = Event()
-all_functions = []
+# Configuração carregada no modo multi-worker (None no modo de desenvolvimento)
+shared_config = None
+# Cache de resultados compartilhado entre os clientes (None com result_cache_mb 0). No
+# modo multi-worker cada worker tem o seu
+result_cache = None
+
+def build_view(refresh, hosts, cloud_host, settings, function_index, config=None):
+    build_policy_arrays(hosts, function_index, settings)
+    return Host_view(refresh=refresh, hosts=tuple(hosts), cloud_host=cloud_host,
+                     settings=settings, function_index=function_index,
+                     url_index=build_url_index(hosts, cloud_host),
+                     host_index={host.getname(): host for host in hosts},
+                     all_functions=get_all_function_names(hosts, cloud_host), config=config)
+
+# Visão de uma configuração recebida (POST ou send_config() do modo embutido). Cada
+# cliente reenvia a configuração ao iniciar: se é a mesma da visão atual, ela continua
+# valendo; se mudou, os hosts de mesmo nome herdam o estado da visão atual
+def reload_view(current, config_content):
+    config = yaml.safe_load(config_content)
+    if current is not None and current.config is not None and current.config == config:
+        return current
+    refresh, hosts, cloud_host, settings, _ = parse_config(config_content)
+    if current is not None:
+        carry_host_state(current, hosts, cloud_host)
+    return build_view(refresh, hosts, cloud_host, settings, build_function_index(hosts, cloud_host, settings.push_stale),
+                      config)
+
+# Leva para os hosts recém-lidos o estado dos de mesmo nome na visão atual: métricas,
+# reserva e latência; as vagas em andamento se as vagas do host não mudaram (senão a
+# tabela nova tem outra época e os tickets antigos não valem nela); o enlace se rtt_ms e
+# bandwidth_mbps não mudaram; e a saúde das urls de cada função se elas não mudaram.
+# O índice de funções precisa ser montado depois, com os Url_pool herdados
+def carry_host_state(current, hosts, cloud_host):
+    for host in hosts:
+        previous = current.host_index.get(host.getname())
+        if previous is None:
+            continue
+        if same_slots(previous.state.slots, host.state.slots):
+            host.state = previous.state
+        else:
+            host.state.metrics = previous.state.metrics
+            host.state.last_use_ts = previous.state.last_use_ts
+            host.state.latency = previous.state.latency
+        if same_link(previous.link, host.link):
+            host.link = previous.link
+        for function_name, pool in host.url_pools.items():
+            previous_pool = previous.url_pools.get(function_name)
+            if previous_pool is not None and ((previous_pool.urls, previous_pool.balancing, previous_pool.timeout)
+                                              == (pool.urls, pool.balancing, pool.timeout)):
+                host.url_pools[function_name] = previous_pool
+
+    previous_cloud = current.cloud_host
+    if cloud_host and previous_cloud:
+        cloud_host.latency = previous_cloud.latency
+        if same_link(previous_cloud.link, cloud_host.link):
+            cloud_host.link = previous_cloud.link
+
+def same_slots(previous, slots):
+    if previous is None or slots is None:
+        return previous is slots
+    return ((previous.capacity, previous.timeout, previous.function_limits, previous.limits_all)
+            == (slots.capacity, slots.timeout, slots.function_limits, slots.limits_all))
+
+def same_link(previous, link):
+    return (previous.prior_fixed, previous.prior_per_byte) == (link.prior_fixed, link.prior_per_byte)
+
+# Cria o cache de resultados com o tamanho e a validade da configuração. Mantém o atual
+# (e o que já foi guardado) se eles não mudaram, já que cada cliente reenvia a configuração
+def configure_result_cache(settings):
+    global result_cache
+
+    if not settings.result_cache_bytes:
+        result_cache = None
+    elif (result_cache is None or result_cache.max_bytes != settings.result_cache_bytes
+          or result_cache.ttl != settings.result_cache_ttl):
+        result_cache = Result_cache(settings.result_cache_bytes, settings.result_cache_ttl)
+
+# Latência relatada como texto; vazio/inválido (invocação que falhou) vira None
+def parse_latency(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+# Tamanho do payload relatado; vazio/inválido/negativo vira None
+def parse_payload_bytes(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return None
+    return size if size >= 0 else None
+
+# Lista ordenada de candidatos devolvida ao cliente: a url escolhida e até `count`
+# alternativas, cada uma com o p95 da latência observada (None se ainda não há amostras)
+def candidate_list(view, function_name, best_url, count, payload_bytes=0):
+    urls = [best_url] + alternative_candidates(view.function_index, function_name, best_url,
+                                               min(count, MAX_CANDIDATES), view.settings.placement_policy,
+                                               payload_bytes)
+    return [{"url": url, "p95_secs": url_latency_percentile(view.url_index, url, 95)} for url in urls]
+
+# Relatos enviados junto com a decisão (GET /faas?report_url=...&report_latency=...
+# &report_ticket=...&report_bytes=..., podem vir repetidos). report_latency=failed relata
+# uma falha e report_bytes é o tamanho do payload enviado (vazio se não informado)
+def apply_reported_args(view, args):
+    for url, latency, ticket, size in zip_longest(args.getlist('report_url'), args.getlist('report_latency'),
+                                                  args.getlist('report_ticket'), args.getlist('report_bytes'),
+                                                  fillvalue=""):
+        if url:
+            apply_report(view.url_index, url, parse_latency(latency), ticket,
+                         latency == "failed", view.settings.failure_backoff, parse_payload_bytes(size))
+
+# Métricas enviadas pelos hosts: {"metrics": [{"host": nome, "cpu": %, "ram": %}, ...]}
+@app.route('/faas/metrics', methods=['POST'])
+def metrics_push_functionality():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('metrics'), list):
+        return jsonify({"error": "Corpo deve ser {\"metrics\": [{\"host\": ..., \"cpu\": ..., \"ram\": ...}]}."}), 400
+
+    view = host_view
+    accepted = 0
+    for metric in payload['metrics']:
+        if isinstance(metric, dict):
+            accepted += ingest_push(view, metric.get('host'), metric.get('cpu'), metric.get('ram'))
+    return jsonify({"status": "sucesso", "accepted": accepted}), 200
+
+# Relato sem decisão: {"reports": [{"url": ..., "latency_secs": ..., "ticket": ..., "failed": ...,
+# "payload_bytes": ...}, ...]}
+# latency_secs null indica que a latência não foi medida (só libera o ticket),
+# failed: true que a invocação falhou, tirando o host da escolha por failure_backoff_secs,
+# e payload_bytes (opcional) o tamanho do payload enviado, para estimar o enlace
+@app.route('/faas/report', methods=['POST'])
+def report_functionality():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('reports'), list):
+        return jsonify({"error": "Corpo deve ser {\"reports\": [{\"url\": ..., \"latency_secs\": ...}]}."}), 400
+
+    view = host_view
+    recorded = 0
+    for report in payload['reports']:
+        if not isinstance(report, dict) or not report.get('url'):
+            continue
+        recorded += apply_report(view.url_index, report['url'], parse_latency(report.get('latency_secs')),
+                                 report.get('ticket'), bool(report.get('failed')),
+                                 view.settings.failure_backoff, parse_payload_bytes(report.get('payload_bytes')))
+    return jsonify({"status": "sucesso", "recorded": recorded}), 200
+
+# Cache de resultados compartilhado (Adaptive_FaaS com shared_cache): GET /faas/cache?key=...
+# devolve o corpo guardado (404 se não há) com a url que o produziu em X-Faas-Url;
+# PUT /faas/cache?key=...&url=...&ttl_secs=... guarda o corpo da requisição
+@app.route('/faas/cache', methods=['GET', 'PUT'])
+def result_cache_functionality():
+    cache = result_cache
+    if cache is None:
+        return jsonify({"error": "Cache de resultados desligado (result_cache_mb)."}), 404
+    key = request.args.get('key')
+    if not key:
+        return jsonify({"error": "Parâmetro key é obrigatório."}), 400
+
+    if request.method == 'GET':
+        entry = cache.get(key)
+        server_metrics.inc("adapt_result_cache_total", (("result", "miss" if entry is None else "hit"),))
+        if entry is None:
+            return jsonify({"error": "Resultado não está em cache."}), 404
+        body, content_type, url = entry
+        return body, 200, {"Content-Type": content_type, "X-Faas-Url": url}
+
+    body = request.get_data()
+    ttl = request.args.get('ttl_secs', type=float)
+    # A validade pedida pelo cliente não passa da do servidor
+    ttl = cache.ttl if ttl is None else min(ttl, cache.ttl)
+    entry = (body, request.content_type or 'application/octet-stream', request.args.get('url', ''))
+    if not cache.put(key, entry, len(body), ttl):
+        return jsonify({"error": "Resultado maior que o cache."}), 413
+    return jsonify({"status": "sucesso"}), 200
 
 @app.route('/faas', methods=['GET', 'POST'])
 def server_functionality():
-    global edge_fog_hosts_table, cloud_host, refresh_time, all_functions
+    global host_view
 
     if request.method == 'GET':
         if not config_received_event.is_set():
@@ -178,12 +1916,52 @@ def server_functionality():
         if not function_name:
             return jsonify({"error": "Parametro 'function_name' obrigatorio."}), 400
 
-        best_url = None
-        with data_lock:
-            best_url = select_best_host(edge_fog_hosts_table, cloud_host, function_name)
+        view = host_view
+        apply_reported_args(view, request.args)
+        policy = view.settings.placement_policy
+        # Tamanho do payload que o cliente vai enviar (política transfer)
+        payload_bytes = parse_payload_bytes(request.args.get('payload_bytes')) or 0
+        decision_start = time.perf_counter()
+
+        # Decisão em lote: o cliente pede `count` posições de uma vez
+        count = request.args.get('count', type=int)
+        if count is not None:
+            if count < 1 or count > MAX_BATCH_SIZE:
+                return jsonify({"error": f"Parametro 'count' deve estar entre 1 e {MAX_BATCH_SIZE}."}), 400
+            best_urls, tickets = select_best_hosts(view.function_index, function_name, count, policy,
+                                                   payload_bytes)
+            server_metrics.observe("adapt_decision_seconds", time.perf_counter() - decision_start)
+            if best_urls:
+                return jsonify({"function_name": function_name, "best_faas_urls": best_urls,
+                                "tickets": tickets})
+            return jsonify({"error": "Nenhum host disponivel."}), 404
+
+        # Lease opcional: o cliente pede até `lease_slots` usos da mesma url
+        lease_slots = request.args.get('lease_slots', 1, type=int)
+        max_slots = max(1, min(lease_slots, view.settings.lease_max_slots))
+        if view.settings.lease_ttl <= 0:
+            max_slots = 1
+
+        best_url, slots, ticket = select_best_lease(view.function_index, function_name,
+                                                    max_slots, view.settings.lease_ttl, policy, payload_bytes)
+        server_metrics.observe("adapt_decision_seconds", time.perf_counter() - decision_start)
 
         if best_url:
-            return jsonify({"function_name": function_name, "best_faas_url": best_url})
+            response = {"function_name": function_name, "best_faas_url": best_url}
+            # Vaga de execução ocupada: o cliente devolve o ticket ao terminar
+            if ticket:
+                response["ticket"] = ticket
+            if lease_slots > 1 and slots > 1:
+                # Usos espaçados pelo intervalo mínimo do host, como foram reservados
+                host = view.url_index[best_url]
+                response["lease"] = {"slots": slots, "ttl_secs": view.settings.lease_ttl,
+                                     "interval_secs": host.min_interval}
+            # Alternativas para hedge/failover no cliente
+            alternatives = request.args.get('candidates', 0, type=int)
+            if alternatives > 0:
+                response["candidates"] = candidate_list(view, function_name, best_url, alternatives,
+                                                        payload_bytes)
+            return jsonify(response)
         else:
             return jsonify({"error": "Nenhum host disponivel."}), 404
 
@@ -193,30 +1971,127 @@ def server_functionality():
             return jsonify({"error": "Configuração vazia."}), 400
 
         try:
-            new_refresh, new_table, new_cloud = parse_config(new_config_content)
-            
+            # No modo multi-worker cada worker é um processo: a configuração vem do
+            # arquivo na inicialização e só é aceita se for a mesma
+            if shared_config is not None:
+                if yaml.safe_load(new_config_content) == shared_config:
+                    server_metrics.inc("adapt_config_reloads_total", (("result", "ok"),))
+                    return jsonify({"status": "sucesso"}), 200
+                server_metrics.inc("adapt_config_reloads_total", (("result", "error"),))
+                return jsonify({"error": "Servidor em modo multi-worker, reinicie-o para trocar a configuração."}), 409
+
             with data_lock:
-                refresh_time = new_refresh
-                edge_fog_hosts_table = new_table
-                cloud_host = new_cloud
-                all_functions = get_all_function_names(new_table, new_cloud)
+                host_view = reload_view(host_view, new_config_content)
+                configure_result_cache(host_view.settings)
 
             if not config_received_event.is_set():
                 config_received_event.set()
 
+            server_metrics.inc("adapt_config_reloads_total", (("result", "ok"),))
             return jsonify({"status": "sucesso"}), 200
 
         except Exception as e:
             print(f"Erro config: {e}")
+            server_metrics.inc("adapt_config_reloads_total", (("result", "error"),))
             return jsonify({"error": str(e)}), 500
 
+# Métricas do próprio servidor no formato texto do Prometheus
+@app.route('/metrics', methods=['GET'])
+def metrics_functionality():
+    return server_metrics.exposition(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
 def run_server(host_url, port):
     app.run(host=host_url, port=port, use_reloader=False)
 
+# Recebe os pushes de métricas por UDP (push_udp_port), roda para sempre
+def push_listener(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('0.0.0.0', port))
+    while True:
+        datagram, _ = sock.recvfrom(PUSH_MAX_DATAGRAM)
+        ingest_datagram(host_view, datagram)
+
+def start_push_listener(settings):
+    if not settings.push_udp_port:
+        return None
+    thread = Thread(target=push_listener, args=(settings.push_udp_port,), daemon=True)
+    thread.start()
+    print(f"Recebendo métricas por UDP na porta {settings.push_udp_port}.")
+    return thread
+
+# Loop de coleta de métricas, roda para sempre. get_view() dá a visão atual a cada ciclo
+# e record_durations recebe os tempos de coleta dos hosts coletados no ciclo
+def scrape_loop(get_view, record_durations):
+    scheduler = None
+    while True:
+        # Lê uma visão consistente; as métricas são publicadas nos hosts dela
+        view = get_view()
+
+        # Coleta adaptativa: só os hosts vencidos, agenda refeita se a visão mudou
+        if view.settings.adaptive_scrape:
+            if scheduler is None or scheduler.view is not view:
+                scheduler = Scrape_scheduler(view)
+            record_durations(scheduler.step())
+            time.sleep(scheduler.wait_time())
+            continue
+
+        # Faz as requisições de rede (Lento) SEM lock, para não travar o cliente
+        record_durations(update_metrics_routine(view.hosts, QUERY_CPU, QUERY_RAM,
+                                                view.settings.scrape_deadline, view.refresh,
+                                                view.settings.push_stale))
+        time.sleep(view.refresh)
+
+# Tempos de coleta de um ciclo ({host: segundos, None se estourou o prazo}) em /metrics
+def record_scrape_durations(durations):
+    for name, duration in durations.items():
+        server_metrics.set("adapt_scrape_last_duration_seconds", float('nan') if duration is None else duration,
+                           (("host", name),))
+
+# Coleta da visão global do servidor
+def metrics_loop():
+    scrape_loop(lambda: host_view, record_scrape_durations)
+
+# Agendador embutido: a mesma decisão do servidor, mas dentro do processo do cliente
+# (Adaptive_FaaS com embedded=True), sem o Flask e sem o salto de rede
+class Embedded_scheduler:
+    def __init__(self):
+        self.view = None
+        self.thread = None
+
+    # Carrega (ou troca) a configuração e inicia a coleta de métricas na primeira vez
+    def load_config(self, config):
+        self.view = reload_view(self.view, config)
+        if self.thread is None:
+            self.thread = Thread(target=scrape_loop, args=(lambda: self.view, record_scrape_durations),
+                                 daemon=True)
+            self.thread.start()
+
+    # Retorna (url, ticket)
+    def select(self, function_name, payload_bytes=0):
+        view = self.view
+        url, _, ticket = select_best_lease(view.function_index, function_name,
+                                           policy=view.settings.placement_policy, payload_bytes=payload_bytes)
+        return url, ticket
+
+    # Retorna (url, ticket, candidatos): candidatos como no GET /faas?candidates=N
+    def select_with_candidates(self, function_name, count, payload_bytes=0):
+        url, ticket = self.select(function_name, payload_bytes)
+        if not url:
+            return url, ticket, []
+        return url, ticket, candidate_list(self.view, function_name, url, count, payload_bytes)
+
+    # Retorna (urls, tickets)
+    def select_many(self, function_name, count, payload_bytes=0):
+        view = self.view
+        return select_best_hosts(view.function_index, function_name, count,
+                                 view.settings.placement_policy, payload_bytes)
+
+    def report(self, url, latency, ticket="", failed=False, payload_bytes=None):
+        view = self.view
+        return apply_report(view.url_index, url, latency, ticket, failed, view.settings.failure_backoff,
+                            payload_bytes)
+
 def start(host_url, port):
-    global edge_fog_hosts_table
-    global refresh_time
-    
     # Inicia thread do servidor Flask
     server_thread = Thread(target=run_server, args=(host_url, port))
     server_thread.daemon = True
@@ -224,19 +2099,53 @@ def start(host_url, port):
 
     print(f"Servidor iniciado em {host_url}:{port}. Aguardando configuração...")
     config_received_event.wait() 
+    start_push_listener(host_view.settings)
 
-    # Queries Prometheus
-    query_cpu = "(1 - avg by (instance) (rate(node_cpu_seconds_total{mode=\"idle\"}[15s]))) * 100"
-    query_RAM = "((avg_over_time(node_memory_MemTotal_bytes[15s]) - avg_over_time(node_memory_MemAvailable_bytes[15s]))/ avg_over_time(node_memory_MemTotal_bytes[15s])) * 100"
-    
-    while True:
+    metrics_loop()
+
+# Servidor WSGI pre-fork (gunicorn) com o app Flask já carregado no processo mestre
+if BaseApplication is not None:
+    class Production_server(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+# Modo de produção: vários workers (processos) atendendo /faas e um único processo de
+# coleta (o que chamou esta função). O estado dos hosts (CPU, RAM, last_use_ts) fica numa Shared_host_table criada
+# antes do fork, então todos os workers enxergam as mesmas métricas e reservas
+def run_production(config_file_path, bind="0.0.0.0:5000", workers=4):
+    global host_view, shared_config
+
+    if BaseApplication is None:
+        raise RuntimeError("O modo multi-worker precisa do gunicorn (pip install gunicorn).")
+
+    with open(config_file_path, 'r') as file:
+        config = file.read()
+
+    ctx = multiprocessing.get_context('fork')
+    refresh, hosts, cloud, settings, function_index = parse_config(config)
+    shared_table = Shared_host_table(hosts, ctx, settings.in_flight_timeout)
+    for index, host in enumerate(hosts):
+        host.state = shared_table.state(index)
+
+    host_view = build_view(refresh, hosts, cloud, settings, function_index)
+    configure_result_cache(settings)
+    shared_config = yaml.safe_load(config)
+    config_received_event.set()
 
-        with data_lock:
-            current_refresh = refresh_time
+    # O gunicorn (mestre + workers) roda num processo filho; este processo fica só com a
+    # coleta, como no start()
+    server = ctx.Process(target=Production_server({'bind': bind, 'workers': workers}).run,
+                         daemon=True)
+    server.start()
 
-            hosts_ref = edge_fog_hosts_table 
-        
-        # Faz as requisições de rede (Lento) SEM o Lock, para não travar o cliente
-        update_metrics_routine(hosts_ref, query_cpu, query_RAM)
-        
-        time.sleep(current_refresh)
\ No newline at end of file
+    print(f"Servidor iniciado em {bind} com {workers} workers.")
+    start_push_listener(settings)
+    metrics_loop()
@@ -0,0 +1,67 @@
+import time
+import sys
+import socket
+import requests
+
+# Agente que roda em cada host e envia CPU e RAM direto ao servidor de decisão, sem
+# esperar a coleta do Prometheus.
+# uso: python agente_metricas.py <nome do host no config.yml> <destino> [intervalo em segundos]
+# destino: <servidor>:<porta UDP> (push_udp_port) ou http://<servidor>:<porta>/faas/metrics
+
+NOME_HOST = socket.gethostname()
+DESTINO = "127.0.0.1:5001"
+INTERVALO = 0.25
+
+def read_cpu_times():
+    # Primeira linha do /proc/stat: cpu user nice system idle iowait irq softirq steal ...
+    with open('/proc/stat', 'r') as f:
+        fields = [int(value) for value in f.readline().split()[1:]]
+    idle = fields[3] + fields[4]
+    return sum(fields), idle
+
+def read_ram_use():
+    meminfo = {}
+    with open('/proc/meminfo', 'r') as f:
+        for line in f:
+            key, value = line.split(':', 1)
+            meminfo[key] = int(value.split()[0])
+    return (meminfo['MemTotal'] - meminfo['MemAvailable']) / meminfo['MemTotal'] * 100
+
+def make_sender(destino):
+    if destino.startswith('http'):
+        session = requests.Session()
+
+        def send(nome, cpu, ram):
+            try:
+                session.post(destino, json={"metrics": [{"host": nome, "cpu": cpu, "ram": ram}]}, timeout=1)
+            except requests.exceptions.RequestException as e:
+                print(f"[ERRO] Falha ao enviar métricas: {e}")
+        return send
+
+    servidor, porta = destino.rsplit(':', 1)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    endereco = (servidor, int(porta))
+
+    def send(nome, cpu, ram):
+        sock.sendto(f"{nome} {cpu:.2f} {ram:.2f}".encode('utf-8'), endereco)
+    return send
+
+def main():
+    nome = sys.argv[1] if len(sys.argv) > 1 else NOME_HOST
+    destino = sys.argv[2] if len(sys.argv) > 2 else DESTINO
+    intervalo = float(sys.argv[3]) if len(sys.argv) > 3 else INTERVALO
+
+    send = make_sender(destino)
+    print(f"[INFO] Enviando métricas de '{nome}' para {destino} a cada {intervalo}s")
+
+    last_total, last_idle = read_cpu_times()
+    while True:
+        time.sleep(intervalo)
+        total, idle = read_cpu_times()
+        delta_total = total - last_total
+        cpu = 0.0 if delta_total <= 0 else (1 - (idle - last_idle) / delta_total) * 100
+        last_total, last_idle = total, idle
+        send(nome, cpu, read_ram_use())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+# Benchmark offline: gateways OpenFaaS e Prometheus falsos (stubs.py) no lugar de TVBox,
+# Desktop e Google, e os cenários que medem o servidor e o cliente contra eles (run.py).
+# uso: python -m benchmark.run --help (a partir da raiz do repositório)
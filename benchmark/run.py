@@ -0,0 +1,260 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from threading import Thread
+
+import requests
+import yaml
+
+import adapt_exec_server as server
+from adapt_exec_client import Adaptive_FaaS
+from benchmark.stubs import Latency_model, Stub_faas, Stub_prometheus, read_trace, LATENCY_DISTRIBUTIONS
+
+# Benchmark offline do servidor de decisão e do cliente, contra stubs locais.
+# Cenários (cada um imprime uma seção do relatório):
+#   decision: tempo de select_best_lease no próprio processo (p50/p99), sem HTTP
+#   server:   requisições por segundo em GET /faas com `concurrency` clientes a `rate` req/s
+#   scrape:   tempo de um ciclo de coleta (update_metrics_routine) por quantidade de hosts,
+#             com um Prometheus por host e com todos atrás de um só (prometheus_instance)
+#   client:   custo do Adaptive_FaaS.request por chamada, comparado ao POST direto
+# Com a mesma semente e os mesmos parâmetros o relatório é repetível (a menos do ruído
+# da máquina)
+
+FUNCTION_NAME = "bench"
+SERVER_PORT = 5050
+SCENARIOS = ("decision", "server", "scrape", "client")
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+def summary(values):
+    return {"p50_ms": percentile(values, 50) * 1000, "p99_ms": percentile(values, 99) * 1000,
+            "mean_ms": sum(values) / len(values) * 1000 if values else float('nan'), "samples": len(values)}
+
+# Traço sintético de CPU/RAM: passeio aleatório entre 5% e 95%
+def synthetic_trace(seed, length=120):
+    rng = random.Random(seed)
+    cpu, ram = rng.uniform(10, 60), rng.uniform(20, 70)
+    trace = []
+    for _ in range(length):
+        cpu = min(95.0, max(5.0, cpu + rng.gauss(0, 5)))
+        ram = min(95.0, max(5.0, ram + rng.gauss(0, 2)))
+        trace.append((cpu, ram))
+    return trace
+
+# config.yml com `count` hosts de borda (um gateway falso cada) e a nuvem. batched: todos os
+# hosts no mesmo Prometheus, separados por prometheus_instance
+def build_config(count, faas, prometheus, cloud_url=None, refresh=1, batched=False, max_cpu=80):
+    hosts = {}
+    if cloud_url:
+        hosts["Cloud"] = {"layer": "cloud", "faas_urls": [cloud_url]}
+    for index in range(count):
+        name = f"host{index}"
+        hosts[name] = {
+            "priority": "high" if index % 2 == 0 else "low",
+            "layer": "edge",
+            "faas_urls": [faas.url(FUNCTION_NAME)],
+            "prometheus_api_url": prometheus.url() if batched else prometheus.url(name),
+            "max_cpu_use": max_cpu,
+            "max_ram_use": 90,
+            "min_req_interval_secs": 0,
+        }
+        if batched:
+            hosts[name]["prometheus_instance"] = name
+    return yaml.safe_dump({"refresh_interval_secs": refresh, "scrape_deadline_secs": 5, "hosts": hosts},
+                          sort_keys=False)
+
+def make_prometheus(count, seed, trace=None, delay=0.0):
+    return Stub_prometheus({f"host{index}": trace or synthetic_trace(seed + index) for index in range(count)},
+                           delay=delay)
+
+def bench_decision(args):
+    faas = Stub_faas()
+    prometheus = make_prometheus(args.hosts, args.seed)
+    view = server.build_view(*server.parse_config(build_config(args.hosts, faas, prometheus,
+                                                               faas.url(FUNCTION_NAME))))
+    # Metade dos hosts acima do limite de CPU, para a decisão percorrer candidatos
+    for index, host in enumerate(view.hosts):
+        host.state.publish(90.0 if index % 2 == 0 else 10.0, 10.0)
+
+    timings = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        server.select_best_lease(view.function_index, FUNCTION_NAME)
+        timings.append(time.perf_counter() - start)
+    faas.stop()
+    prometheus.stop()
+    return {"hosts": args.hosts, **summary(timings)}
+
+# Inicia o servidor de decisão neste processo (uma vez) com `hosts` hosts de borda
+def start_server(args, faas, prometheus):
+    config = build_config(args.hosts, faas, prometheus, faas.url(FUNCTION_NAME))
+    # Sem o log de cada requisição do servidor de desenvolvimento
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    Thread(target=server.start, args=('127.0.0.1', args.port), daemon=True).start()
+    url = f"http://127.0.0.1:{args.port}/faas"
+    for _ in range(50):
+        try:
+            if requests.post(url, data=config, timeout=1).ok:
+                break
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    time.sleep(0.5) # primeiro ciclo de coleta
+    return url, config
+
+def bench_server(args, url):
+    timings = [[] for _ in range(args.concurrency)]
+    errors = [0] * args.concurrency
+    # Cada cliente espera concurrency / rate segundos entre envios (rate 0: sem pausa)
+    interval = args.concurrency / args.rate if args.rate > 0 else 0
+    deadline = time.perf_counter() + args.duration
+
+    def worker(index):
+        session = requests.Session()
+        next_send = time.perf_counter()
+        while next_send < deadline:
+            start = time.perf_counter()
+            try:
+                if not session.get(url, params={"function_name": FUNCTION_NAME}, timeout=5).ok:
+                    errors[index] += 1
+            except requests.exceptions.RequestException:
+                errors[index] += 1
+            timings[index].append(time.perf_counter() - start)
+            next_send = max(next_send + interval, time.perf_counter()) if interval else time.perf_counter()
+            time.sleep(max(0.0, next_send - time.perf_counter()))
+
+    started = time.perf_counter()
+    threads = [Thread(target=worker, args=(index,)) for index in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [value for worker_timings in timings for value in worker_timings]
+    return {"concurrency": args.concurrency, "target_rate": args.rate,
+            "requests_per_sec": len(latencies) / elapsed, "errors": sum(errors), **summary(latencies)}
+
+def bench_scrape(args):
+    results = []
+    faas = Stub_faas()
+    for count in args.host_counts:
+        row = {"hosts": count}
+        for batched in (False, True):
+            prometheus = make_prometheus(count, args.seed, delay=args.prometheus_delay)
+            _, hosts, _, _, _ = server.parse_config(build_config(count, faas, prometheus, batched=batched))
+            cycles = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                server.update_metrics_routine(hosts, server.QUERY_CPU, server.QUERY_RAM)
+                cycles.append(time.perf_counter() - start)
+            prometheus.stop()
+            row["batched_ms" if batched else "per_host_ms"] = percentile(cycles, 50) * 1000
+        results.append(row)
+    faas.stop()
+    return results
+
+def bench_client(args, config, faas):
+    with tempfile.NamedTemporaryFile('w', suffix='.yml', delete=False) as file:
+        file.write(config)
+    client = Adaptive_FaaS(f"http://127.0.0.1:{args.port}", file.name)
+    session = requests.Session()
+    direct = []
+    through_client = []
+    # O request() imprime a url escolhida a cada chamada
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        client.send_config()
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            session.post(faas.url(FUNCTION_NAME), data="{}", timeout=5)
+            direct.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            client.request(FUNCTION_NAME, "{}", json=True)
+            through_client.append(time.perf_counter() - start)
+        client.close()
+    os.unlink(file.name)
+
+    # A latência da função varia de uma chamada para outra: o custo é a diferença entre os
+    # percentis, não entre pares de chamadas
+    direct, through_client = summary(direct), summary(through_client)
+    overhead = {key: through_client[key] - direct[key] for key in ("p50_ms", "p99_ms", "mean_ms")}
+    return {"direct": direct, "client": through_client, "overhead": overhead}
+
+def print_report(report):
+    if "decision" in report:
+        row = report["decision"]
+        print(f"\n== decisão (select_best_lease, {row['hosts']} hosts, {row['samples']} chamadas)")
+        print(f"p50 {row['p50_ms'] * 1000:.1f} µs   p99 {row['p99_ms'] * 1000:.1f} µs")
+    if "server" in report:
+        row = report["server"]
+        print(f"\n== GET /faas ({row['concurrency']} clientes, alvo {row['target_rate'] or 'máximo'} req/s)")
+        print(f"{row['requests_per_sec']:.0f} req/s   p50 {row['p50_ms']:.2f} ms   p99 {row['p99_ms']:.2f} ms"
+              f"   erros {row['errors']}")
+    if "scrape" in report:
+        print("\n== ciclo de coleta (p50)")
+        print(f"{'hosts':>6} {'um Prometheus por host':>24} {'Prometheus único':>18}")
+        for row in report["scrape"]:
+            print(f"{row['hosts']:>6} {row['per_host_ms']:>21.1f} ms {row['batched_ms']:>15.1f} ms")
+    if "client" in report:
+        row = report["client"]
+        print(f"\n== custo do cliente por chamada ({row['client']['samples']} chamadas)")
+        for name in ("direct", "client", "overhead"):
+            print(f"{name:>9}: p50 {row[name]['p50_ms']:.2f} ms   p99 {row[name]['p99_ms']:.2f} ms")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark offline do adapt_exec_server e do Adaptive_FaaS.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--hosts", type=int, default=4, help="hosts de borda nos cenários decision/server/client")
+    parser.add_argument("--iterations", type=int, default=100000, help="decisões no cenário decision")
+    parser.add_argument("--rate", type=float, default=0, help="req/s alvo em GET /faas (0: máximo)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5, help="segundos de carga em GET /faas")
+    parser.add_argument("--host-counts", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--repeats", type=int, default=5, help="ciclos de coleta por quantidade de hosts")
+    parser.add_argument("--prometheus-delay", type=float, default=0.0, help="atraso de cada consulta ao Prometheus falso")
+    parser.add_argument("--calls", type=int, default=200, help="chamadas no cenário client")
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed",
+                        help="distribuição de latência da função falsa")
+    parser.add_argument("--latency-mean", type=float, default=0.0)
+    parser.add_argument("--latency-spread", type=float, default=0.0)
+    parser.add_argument("--trace", help="CSV com o traço de CPU/RAM (cpu,ram por linha) dos hosts")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--json", help="também grava o relatório neste arquivo")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {"parameters": vars(args)}
+    if "decision" in args.scenarios:
+        report["decision"] = bench_decision(args)
+    if "scrape" in args.scenarios:
+        report["scrape"] = bench_scrape(args)
+    if "server" in args.scenarios or "client" in args.scenarios:
+        faas = Stub_faas(default=Latency_model(args.latency, args.latency_mean, args.latency_spread, args.seed))
+        # Hosts sempre abaixo dos limites (ou o traço dado), para a decisão ficar na borda
+        trace = read_trace(args.trace) if args.trace else [(10.0, 10.0)]
+        prometheus = make_prometheus(args.hosts, args.seed, trace)
+        url, config = start_server(args, faas, prometheus)
+        if "server" in args.scenarios:
+            report["server"] = bench_server(args, url)
+        if "client" in args.scenarios:
+            report["client"] = bench_client(args, config, faas)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
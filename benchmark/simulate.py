@@ -0,0 +1,305 @@
+import argparse
+import contextlib
+import heapq
+import json
+import math
+import random
+import sys
+import time
+from collections import deque
+
+import yaml
+
+import adapt_exec_server as server
+from benchmark.run import percentile, synthetic_trace
+from benchmark.stubs import Latency_model, read_trace
+
+# Simulador de eventos discretos: a decisão é a do servidor (parse_config, Host_table_entry
+# e select_best_lease/select_best_host, sem mudanças), mas o tempo é virtual. Chegadas,
+# fim de execuções e coletas de métricas são eventos numa fila de prioridade, então uma
+# semana de tráfego roda em segundos.
+# Cada host é uma fila FCFS com `capacity` execuções simultâneas (a nuvem não tem limite)
+# e tempo de serviço sorteado do seu modelo. A CPU publicada em cada coleta é a do traço
+# de fundo do host somada à ocupação simulada, vista com o atraso de refresh_interval_secs
+# como no servidor real, pelo mesmo caminho da coleta do servidor: previsão (forecast_mode),
+# push_stale e, com adaptive_scrape, a coleta de cada host no intervalo do
+# Scrape_scheduler. Não há hosts enviando métricas (push). Com payload_bytes nas chegadas e bandwidth_mbps no host, o tempo
+# de envio do payload entra na latência (sem ocupar o host) e o tamanho vai nos relatos,
+# como faz o Adaptive_FaaS.
+# uso: python -m benchmark.simulate <simulação.yml> [--policy first_fit latency ...]
+
+# Início do relógio virtual (o estado dos hosts começa com last_use_ts = 0)
+START_TS = 1_000_000_000.0
+
+# Tipos de evento; no mesmo instante o fim de uma execução vem antes da próxima chegada
+COMPLETION = 0
+SCRAPE = 1
+ARRIVAL = 2
+
+# Relógio virtual no lugar do módulo time dentro do adapt_exec_server
+class Virtual_clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+@contextlib.contextmanager
+def virtual_time(clock):
+    real_time = server.time
+    server.time = clock
+    try:
+        yield clock
+    finally:
+        server.time = real_time
+
+# Host simulado: fila, modelo de serviço, traço de fundo e modelo de energia
+class Sim_host:
+    def __init__(self, name, layer, spec, trace, trace_step, seed):
+        service = spec.get('service') or {}
+        self.name = name
+        self.layer = layer
+        self.service = Latency_model(service.get('distribution', 'fixed'), service.get('mean', 1.0),
+                                     service.get('spread', 0.0), seed)
+        self.capacity = spec.get('capacity', None if layer == 'cloud' else 1)
+        self.rtt = spec.get('rtt_secs', 0.0)
+        self.bandwidth = spec.get('bandwidth_mbps', 0.0) * 1e6 / 8 # bytes/s, 0 = sem custo de envio
+        self.idle_watts = spec.get('idle_watts', 0.0)
+        self.busy_watts = spec.get('busy_watts', 0.0)
+        self.joules_per_request = spec.get('joules_per_request', 0.0)
+        self.trace = trace
+        self.trace_step = trace_step
+        self.busy = 0
+        self.queue = deque()
+        self.busy_seconds = 0.0
+        self.completed = 0
+
+    def transfer_time(self, size):
+        return size / self.bandwidth if self.bandwidth else 0.0
+
+    def background(self, elapsed):
+        return self.trace[int(elapsed // self.trace_step) % len(self.trace)]
+
+    # CPU/RAM que a coleta veria agora: fundo mais a ocupação das execuções simuladas
+    def metrics(self, elapsed):
+        cpu, ram = self.background(elapsed)
+        if self.capacity:
+            cpu = min(100.0, cpu + 100.0 * self.busy / self.capacity)
+        return cpu, ram
+
+    # Energia em joules durante `duration` segundos
+    def energy(self, duration):
+        joules = self.joules_per_request * self.completed
+        if self.capacity:
+            joules += self.idle_watts * duration
+            joules += (self.busy_watts - self.idle_watts) * self.busy_seconds / self.capacity
+        return joules
+
+def build_trace(spec, seed):
+    if spec.get('trace'):
+        return read_trace(spec['trace'])
+    if spec.get('background') is not None:
+        return [tuple(spec['background'])]
+    return synthetic_trace(seed)
+
+# Chegadas: arquivo CSV (segundos desde o início[,função] por linha) ou Poisson com taxa
+# `rate_per_sec`, modulada ao longo do dia por `diurnal_amplitude` (0 a 1)
+def arrivals_from(spec, duration, rng):
+    if spec.get('trace'):
+        with open(spec['trace'], 'r') as file:
+            for line in file:
+                fields = line.strip().split(',')
+                try:
+                    ts = float(fields[0])
+                except ValueError:
+                    continue # cabeçalho
+                if ts > duration:
+                    return
+                yield ts, fields[1] if len(fields) > 1 and fields[1] else spec['function_name']
+        return
+
+    rate = spec['rate_per_sec']
+    amplitude = spec.get('diurnal_amplitude', 0.0)
+    peak = rate * (1 + amplitude)
+    ts = 0.0
+    while True:
+        # Thinning: candidatos à taxa de pico, aceitos com a taxa do momento
+        ts += rng.expovariate(peak)
+        if ts > duration:
+            return
+        current = rate * (1 + amplitude * math.sin(2 * math.pi * ts / 86400))
+        if rng.random() * peak <= current:
+            yield ts, spec['function_name']
+
+# Tamanho do payload de cada chegada: número fixo (bytes) ou {distribution, mean, spread}
+# como o service dos hosts
+def payload_model(spec, seed):
+    payload = spec.get('payload_bytes', 0)
+    if not isinstance(payload, dict):
+        return Latency_model('fixed', payload, 0.0, seed)
+    return Latency_model(payload.get('distribution', 'fixed'), payload.get('mean', 0), payload.get('spread', 0.0), seed)
+
+def load_simulation(path):
+    with open(path, 'r') as file:
+        simulation = yaml.safe_load(file)
+    with open(simulation['config'], 'r') as file:
+        simulation['config_content'] = file.read()
+    return simulation
+
+def simulate(simulation, policy=None, duration=None, seed=None):
+    config = yaml.safe_load(simulation['config_content'])
+    if policy:
+        config['placement_policy'] = policy
+    duration = duration or simulation['duration_secs']
+    seed = simulation.get('seed', 1) if seed is None else seed
+    rng = random.Random(seed)
+
+    clock = Virtual_clock(START_TS)
+    with virtual_time(clock):
+        view = server.build_view(*server.parse_config(yaml.safe_dump(config)))
+        refresh = view.refresh
+        host_specs = simulation.get('hosts') or {}
+        sim_hosts = {}
+        by_url = {}
+        entries = list(view.hosts) + ([view.cloud_host] if view.cloud_host else [])
+        for index, entry in enumerate(entries):
+            spec = host_specs.get(entry.getname()) or {}
+            sim_host = Sim_host(entry.getname(), entry.getlayer(), spec, build_trace(spec, seed + index),
+                                spec.get('trace_step_secs', refresh), seed + index)
+            sim_hosts[entry.getname()] = sim_host
+            for url in entry.getfaas_urls() or []:
+                by_url[url] = sim_host
+
+        settings = view.settings
+        scheduler = server.Scrape_scheduler(view) if settings.adaptive_scrape else None
+        if settings.push_udp_port:
+            print("Aviso: push_udp_port ignorado, a simulação não tem hosts enviando métricas.",
+                  file=sys.stderr)
+
+        events = []
+        sequence = 0
+        latencies = []
+        tiers = {}
+        dropped = 0
+        arrivals = arrivals_from(simulation['arrivals'], duration, rng)
+        payloads = payload_model(simulation['arrivals'], seed)
+
+        def push(ts, kind, payload):
+            nonlocal sequence
+            sequence += 1
+            heapq.heappush(events, (ts, kind, sequence, payload))
+
+        def begin(sim_host, job):
+            service = sim_host.service.sample()
+            sim_host.busy += 1
+            sim_host.busy_seconds += service
+            push(clock.now + service, COMPLETION, (sim_host, job))
+
+        # Coleta como update_metrics_routine, com a amostra do host simulado no lugar do Prometheus
+        def scrape(host, ts):
+            cpu_use, ram_use = sim_hosts[host.getname()].metrics(ts - START_TS)
+            if host.history is not None:
+                cpu_use, ram_use = server.forecast_scraped(host, [(ts, cpu_use)], [(ts, ram_use)], ts + refresh)
+            server.publish_scraped(host, cpu_use, ram_use, ts, settings.push_stale)
+
+        def next_arrival():
+            arrival = next(arrivals, None)
+            if arrival is not None:
+                push(START_TS + arrival[0], ARRIVAL, arrival[1])
+
+        # Coleta de todos os hosts a cada refresh, ou de cada host na sua vez (adaptive_scrape)
+        for host in (view.hosts if scheduler else (None,)):
+            push(START_TS, SCRAPE, host)
+        next_arrival()
+        wall_start = time.perf_counter()
+        while events:
+            ts, kind, _, payload = heapq.heappop(events)
+            clock.now = ts
+
+            if kind == ARRIVAL:
+                next_arrival()
+                size = int(payloads.sample())
+                url, _, ticket = server.select_best_lease(view.function_index, payload,
+                                                          policy=view.settings.placement_policy,
+                                                          payload_bytes=size)
+                sim_host = by_url.get(url)
+                if sim_host is None:
+                    dropped += 1
+                    continue
+                job = (ts, url, ticket, size)
+                if sim_host.capacity is None or sim_host.busy < sim_host.capacity:
+                    begin(sim_host, job)
+                else:
+                    sim_host.queue.append(job)
+
+            elif kind == COMPLETION:
+                sim_host, (arrived, url, ticket, size) = payload
+                sim_host.busy -= 1
+                sim_host.completed += 1
+                latency = ts - arrived + sim_host.rtt + sim_host.transfer_time(size)
+                latencies.append(latency)
+                tiers[sim_host.layer] = tiers.get(sim_host.layer, 0) + 1
+                server.apply_report(view.url_index, url, latency, ticket, payload_bytes=size)
+                if sim_host.queue:
+                    begin(sim_host, sim_host.queue.popleft())
+
+            else:
+                for host in (view.hosts if payload is None else (payload,)):
+                    scrape(host, ts)
+                next_ts = ts + (refresh if payload is None else scheduler.next_interval(payload, ts))
+                if next_ts - START_TS <= duration:
+                    push(next_ts, SCRAPE, payload)
+        wall = time.perf_counter() - wall_start
+
+    completed = len(latencies)
+    energy = {name: sim_host.energy(duration) / 3.6 for name, sim_host in sim_hosts.items()} # mWh
+    return {
+        "policy": view.settings.placement_policy,
+        "duration_secs": duration,
+        "wall_secs": wall,
+        "completed": completed,
+        "dropped": dropped,
+        "throughput_per_sec": completed / duration,
+        "latency_secs": {"mean": sum(latencies) / completed if completed else float('nan'),
+                         "p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+                         "p99": percentile(latencies, 99)},
+        "tiers": {layer: count / completed for layer, count in sorted(tiers.items())} if completed else {},
+        "per_host": {name: sim_host.completed for name, sim_host in sim_hosts.items()},
+        "energy_mWh": energy,
+        "energy_total_mWh": sum(energy.values()),
+    }
+
+def print_result(result):
+    latency = result["latency_secs"]
+    print(f"\n== {result['policy']}: {result['duration_secs']:.0f} s simulados em {result['wall_secs']:.1f} s")
+    print(f"concluídas {result['completed']}   descartadas {result['dropped']}"
+          f"   vazão {result['throughput_per_sec']:.3f}/s")
+    print(f"latência média {latency['mean']:.3f} s   p50 {latency['p50']:.3f} s"
+          f"   p95 {latency['p95']:.3f} s   p99 {latency['p99']:.3f} s")
+    print("camadas: " + "   ".join(f"{layer} {share * 100:.1f}%" for layer, share in result["tiers"].items()))
+    print("energia: " + "   ".join(f"{name} {value:.0f} mWh" for name, value in result["energy_mWh"].items())
+          + f"   total {result['energy_total_mWh']:.0f} mWh")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simula políticas de alocação em tempo virtual.")
+    parser.add_argument("simulation", help="arquivo YAML da simulação (veja benchmark/simulation.yml)")
+    parser.add_argument("--policy", nargs="+", choices=server.PLACEMENT_POLICIES,
+                        help="políticas a comparar (padrão: a do config.yml)")
+    parser.add_argument("--duration", type=float, help="segundos simulados (padrão: duration_secs)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="também grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+
+    simulation = load_simulation(args.simulation)
+    results = [simulate(simulation, policy, args.duration, args.seed) for policy in args.policy or [None]]
+    for result in results:
+        print_result(result)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
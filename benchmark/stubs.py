@@ -0,0 +1,157 @@
+import json
+import math
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Distribuições de latência das funções falsas: mean é a média em segundos e spread a
+# largura (uniform: mean ± spread; lognormal: desvio do log)
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+class Latency_model:
+    def __init__(self, distribution="fixed", mean=0.0, spread=0.0, seed=0):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"distribution deve ser um de {LATENCY_DISTRIBUTIONS}")
+        self.distribution = distribution
+        self.mean = mean
+        self.spread = spread
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self):
+        if self.mean <= 0:
+            return 0.0
+        with self.lock:
+            if self.distribution == "uniform":
+                return max(0.0, self.rng.uniform(self.mean - self.spread, self.mean + self.spread))
+            if self.distribution == "exponential":
+                return self.rng.expovariate(1 / self.mean)
+            if self.distribution == "lognormal":
+                # mu escolhido para a média da lognormal ser `mean`
+                return self.rng.lognormvariate(math.log(self.mean) - self.spread ** 2 / 2, self.spread)
+        return self.mean
+
+class Stub_handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalho e corpo saem em escritas separadas; com o Nagle cada resposta esperaria
+    # o ACK atrasado do cliente (~40 ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+# Servidor HTTP numa thread daemon, em 127.0.0.1 e porta livre (port=0)
+class Stub_server:
+    def __init__(self, handler, port=0):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# Gateway OpenFaaS falso: POST /function/<nome> espera a latência sorteada do modelo
+# da função (ou o `default`) e responde `body`, com o status de `statuses` (200 para
+# as funções fora dele). Conta as invocações por função
+class Stub_faas(Stub_server):
+    def __init__(self, models=None, default=None, body=b"ok", port=0, statuses=None):
+        self.models = models or {}
+        self.default = default or Latency_model()
+        self.body = body
+        self.statuses = statuses or {}
+        self.calls = {}
+        stub = self
+
+        class Handler(Stub_handler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                function_name = self.path.rstrip('/').split('/')[-1]
+                stub.calls[function_name] = stub.calls.get(function_name, 0) + 1
+                time.sleep(stub.models.get(function_name, stub.default).sample())
+                self.send_response(stub.statuses.get(function_name, 200))
+                self.send_header('Content-Length', str(len(stub.body)))
+                self.end_headers()
+                self.wfile.write(stub.body)
+
+        super().__init__(Handler, port)
+
+    def url(self, function_name):
+        return f"{self.base_url()}/function/{function_name}"
+
+# Lê um traço de métricas em CSV: uma amostra (cpu;ram ou cpu,ram) por linha, em %
+def read_trace(path):
+    trace = []
+    with open(path, 'r') as file:
+        for line in file:
+            fields = line.replace(';', ',').split(',')
+            try:
+                trace.append((float(fields[0]), float(fields[1])))
+            except (ValueError, IndexError):
+                continue # cabeçalho ou linha vazia
+    return trace
+
+# Prometheus falso: /api/v1/query e /api/v1/query_range com o traço de CPU/RAM de cada
+# instância, uma amostra a cada `step` segundos desde o início (o traço se repete).
+# A consulta é de CPU se contém "cpu", senão de RAM. A url <base>/<instância>/api/v1/query
+# responde só aquela instância, assim vários hosts têm cada um o seu "Prometheus" no mesmo
+# stub; <base>/api/v1/query responde todas. `delay` segura cada resposta, como um
+# Prometheus lento
+class Stub_prometheus(Stub_server):
+    def __init__(self, traces, step=1.0, delay=0.0, port=0):
+        self.traces = traces
+        self.step = step
+        self.delay = delay
+        self.started = time.time()
+        self.queries = 0
+        stub = self
+
+        class Handler(Stub_handler):
+            def do_GET(self):
+                stub.queries += 1
+                time.sleep(stub.delay)
+                parsed = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                column = 0 if "cpu" in params.get('query', '') else 1
+                prefix = parsed.path.split('/api/v1')[0].strip('/')
+                instances = [prefix] if prefix in stub.traces else list(stub.traces)
+                if parsed.path.endswith('/query_range'):
+                    data = stub.range_result(instances, column, float(params['start']), float(params['end']),
+                                             float(params['step']))
+                else:
+                    data = stub.instant_result(instances, column, time.time())
+                body = json.dumps({"status": "success", "data": data}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        super().__init__(Handler, port)
+
+    def url(self, instance=None):
+        prefix = f"/{instance}" if instance else ""
+        return f"{self.base_url()}{prefix}/api/v1/query"
+
+    def value_at(self, instance, column, ts):
+        trace = self.traces[instance]
+        return trace[int(max(0.0, ts - self.started) // self.step) % len(trace)][column]
+
+    def instant_result(self, instances, column, ts):
+        return {"resultType": "vector",
+                "result": [{"metric": {"instance": instance},
+                            "value": [ts, str(self.value_at(instance, column, ts))]}
+                           for instance in instances]}
+
+    def range_result(self, instances, column, start, end, step):
+        points = [start + index * step for index in range(int((end - start) // step) + 1)]
+        return {"resultType": "matrix",
+                "result": [{"metric": {"instance": instance},
+                            "values": [[ts, str(self.value_at(instance, column, ts))] for ts in points]}
+                           for instance in instances]}
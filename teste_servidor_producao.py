@@ -0,0 +1,3 @@
+import adapt_exec_server
+
+adapt_exec_server.run_production('./config.yml', '0.0.0.0:5000', workers=4)
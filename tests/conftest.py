@@ -0,0 +1,37 @@
+import pytest
+
+import adapt_exec_server as server
+
+# Host da borda padrão dos testes: prioridade alta, limites de 90% e sem intervalo mínimo
+EDGE_HOST = {"priority": "high", "layer": "edge", "max_cpu_use": 90, "max_ram_use": 90,
+             "min_req_interval_secs": 0}
+
+# Configuração (dict do config.yml) com a nuvem e os hosts {nome: propriedades}. Cada host
+# tem as urls http://<nome>/function/<função> das `functions` e o próprio Prometheus,
+# a menos que as propriedades digam outra coisa
+def build_config(hosts, functions=("f",), **settings):
+    config = {"refresh_interval_secs": 15, **settings,
+              "hosts": {"Cloud": {"layer": "cloud",
+                                  "faas_urls": [f"http://cloud/function/{name}" for name in functions]}}}
+    for name, properties in hosts.items():
+        config["hosts"][name] = {**EDGE_HOST,
+                                 "faas_urls": [f"http://{name.lower()}/function/{function}" for function in functions],
+                                 "prometheus_api_url": f"http://{name.lower()}:9000/api/v1/query",
+                                 **properties}
+    return config
+
+@pytest.fixture
+def make_config():
+    return build_config
+
+# Visão montada como no POST de configuração, com todos os hosts em `publish` (CPU, RAM)
+@pytest.fixture
+def make_view():
+    def make(hosts, functions=("f",), publish=(10.0, 10.0), **settings):
+        config = build_config(hosts, functions, **settings)
+        view = server.build_view(*server.parse_config(server.yaml.safe_dump(config)))
+        if publish is not None:
+            for host in view.hosts:
+                host.state.publish(*publish)
+        return view
+    return make
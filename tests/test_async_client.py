@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from adapt_exec_client import AsyncAdaptive_FaaS
+from benchmark.stubs import Stub_faas
+
+@pytest.fixture
+def faas():
+    stub = Stub_faas(body=b"resultado")
+    yield stub
+    stub.stop()
+
+def run_request(faas, **kwargs):
+    async def main():
+        async with AsyncAdaptive_FaaS("http://decisor", "config.yml", report_latency=False, **kwargs) as client:
+            async def placement(function_name, candidates=0, payload_bytes=None):
+                return faas.url(function_name), "", [{"url": faas.url(function_name)}] * 2
+            async def best_placement(function_name, payload_bytes=None):
+                return faas.url(function_name), ""
+            client.get_placement = placement
+            client.get_best_placement = best_placement
+            response, url = await client.request("f", b"x")
+            return await response.read(), await response.text(), url
+    return asyncio.run(main())
+
+# A resposta devolvida pelo request() ainda tem o corpo legível por read() e text()
+def test_response_body_is_readable(faas):
+    assert run_request(faas) == (b"resultado", "resultado", faas.url("f"))
+
+def test_hedged_response_body_is_readable(faas):
+    assert run_request(faas, hedge_delay=1)[0] == b"resultado"
@@ -0,0 +1,32 @@
+import pytest
+
+import adapt_exec_server as server
+
+CONFIG = """
+refresh_interval_secs: 15
+forecast_mode: {mode}
+hosts:
+  Cloud: {{layer: cloud, faas_urls: ["http://cloud/function/f"]}}
+  A: {{priority: high, layer: edge, faas_urls: ["http://a/function/f"],
+      prometheus_api_url: "http://a:9000/api/v1/query", max_cpu_use: 90, max_ram_use: 90,
+      min_req_interval_secs: 0}}
+"""
+
+def load_hosts(mode):
+    return server.parse_config(CONFIG.format(mode=mode))[1]
+
+# `off` sem aspas chega como False pelo YAML
+@pytest.mark.parametrize("mode", ["off", '"off"'])
+def test_forecast_mode_off(mode):
+    assert all(host.history is None for host in load_hosts(mode))
+
+def test_unknown_forecast_mode_is_rejected():
+    with pytest.raises(ValueError):
+        load_hosts("on")
+
+# A previsão consulta <prometheus_api_url>_range, que só existe ao lado do /query
+def test_forecast_needs_a_query_url():
+    config = CONFIG.format(mode="linear").replace("/api/v1/query", "/api/v1")
+    with pytest.raises(ValueError):
+        server.parse_config(config)
+    assert server.parse_config(CONFIG.format(mode="off").replace("/api/v1/query", "/api/v1"))
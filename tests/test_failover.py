@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+import requests
+
+from adapt_exec_client import Adaptive_FaaS, AsyncAdaptive_FaaS, aiohttp
+from benchmark.stubs import Stub_faas
+
+@pytest.fixture
+def faas():
+    stub = Stub_faas(statuses={"bad": 400, "down": 503})
+    yield stub
+    stub.stop()
+
+# Cliente com a decisão trocada por `urls` (a escolhida e as alternativas) e os relatos
+# guardados em `reports` como (url, failed)
+def sync_client(urls, reports, **kwargs):
+    client = Adaptive_FaaS("http://decisor", "config.yml", **kwargs)
+    client.get_placement = lambda function_name, candidates=0, payload_bytes=None: (
+        urls[0], "", [{"url": url} for url in urls])
+    client.get_best_placement = lambda function_name, payload_bytes=None: (urls[0], "")
+    client.report = lambda url, latency, ticket="", failed=False, payload_bytes=None: reports.append((url, failed))
+    return client
+
+@pytest.mark.parametrize("kwargs", [{}, {"failover_attempts": 2}])
+def test_client_error_goes_to_the_caller(faas, kwargs):
+    reports = []
+    client = sync_client([faas.url("bad"), faas.url("f")], reports, **kwargs)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.request("bad", b"x")
+    client.close()
+    assert faas.calls == {"bad": 1}
+    assert reports == [(faas.url("bad"), False)]
+
+def test_server_error_fails_over(faas):
+    reports = []
+    client = sync_client([faas.url("down"), faas.url("f")], reports, failover_attempts=1)
+    _, url = client.request("down", b"x")
+    client.close()
+    assert url == faas.url("f")
+    assert (faas.url("down"), True) in reports
+
+def test_async_client_error_goes_to_the_caller(faas):
+    if aiohttp is None:
+        pytest.skip("aiohttp não instalado")
+    reports = []
+    urls = [faas.url("bad"), faas.url("f")]
+
+    async def main():
+        async with AsyncAdaptive_FaaS("http://decisor", "config.yml", failover_attempts=2) as client:
+            async def placement(function_name, candidates=0, payload_bytes=None):
+                return urls[0], "", [{"url": url} for url in urls]
+            async def report(url, latency, ticket="", failed=False, payload_bytes=None):
+                reports.append((url, failed))
+            client.get_placement = placement
+            client.report = report
+            await client.request("bad", b"x")
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(main())
+    assert faas.calls == {"bad": 1}
+    assert reports == [(faas.url("bad"), False)]
@@ -0,0 +1,47 @@
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+import adapt_exec_server as server
+
+TIMESTAMPS = numpy.array([0.0, 15.0, 30.0])
+
+def test_linear_forecast():
+    assert server.forecast_linear(TIMESTAMPS, numpy.array([10.0, 12.0, 14.0]), 45.0) == pytest.approx(16.0)
+    # Mínimos quadrados de (-30, 10), (-15, 20), (0, 20): inclinação 1/3, 65/3 em 0
+    assert server.forecast_linear(TIMESTAMPS, numpy.array([10.0, 20.0, 20.0]), 45.0) == pytest.approx(80 / 3)
+    assert server.forecast_linear(TIMESTAMPS[:1], numpy.array([10.0]), 45.0) == 10.0
+
+def test_holt_forecast():
+    # Série linear: nível e tendência acompanham exatamente
+    assert server.forecast_holt(TIMESTAMPS, numpy.array([10.0, 12.0, 14.0]), 45.0) == pytest.approx(16.0)
+    # Nível 10 -> 20 -> 25, tendência 10 -> 10 -> 8,5 (alfa 0,5, beta 0,3), um passo adiante
+    assert server.forecast_holt(TIMESTAMPS, numpy.array([10.0, 20.0, 20.0]), 45.0) == pytest.approx(33.5)
+    assert server.forecast_holt(TIMESTAMPS[:1], numpy.array([10.0]), 45.0) == 10.0
+
+# Só entram amostras com CPU e RAM no mesmo instante, em ordem e sem repetir
+def test_history_extend_skips_unmatched_and_old_samples():
+    history = server.Metric_history(4, 15, "linear")
+    history.extend([(0, 1.0), (15, 2.0), (30, 3.0)], [(0, 10.0), (30, 30.0)])
+    history.extend([(30, 9.0), (15, 9.0), (45, 4.0)], [(30, 90.0), (15, 90.0), (45, 40.0)])
+    timestamps, cpu, ram = history.series()
+    assert timestamps.tolist() == [0, 30, 45]
+    assert cpu.tolist() == [1.0, 3.0, 4.0]
+    assert ram.tolist() == [10.0, 30.0, 40.0]
+    assert history.next_start(60) == 60
+
+# O buffer circular guarda as `size` mais recentes, em ordem cronológica
+def test_history_wraps_around():
+    history = server.Metric_history(3, 15, "linear")
+    samples = [(15.0 * index, float(index)) for index in range(5)]
+    history.extend(samples, samples)
+    timestamps, cpu, _ = history.series()
+    assert timestamps.tolist() == [30.0, 45.0, 60.0]
+    assert cpu.tolist() == [2.0, 3.0, 4.0]
+
+# Previsão limitada a 0-100% e indisponível quando o histórico envelheceu
+def test_history_forecast_is_clamped_and_expires():
+    history = server.Metric_history(3, 15, "linear")
+    history.extend([(0, 60.0), (15, 80.0), (30, 100.0)], [(0, 50.0), (15, 40.0), (30, 30.0)])
+    assert history.forecast(45) == (100.0, 20.0)
+    assert history.forecast(30 + 3 * 15 + 1) == (float('inf'), float('inf'))
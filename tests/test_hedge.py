@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from adapt_exec_client import Adaptive_FaaS
+from benchmark.stubs import Stub_faas, Latency_model
+
+@pytest.fixture
+def faas():
+    stub = Stub_faas(default=Latency_model("fixed", 0.2))
+    yield stub
+    stub.stop()
+
+# Com o attempt_executor cheio (2 workers, 8 requisições) a espera na fila não conta
+# para o atraso do hedge: cada tentativa leva 0.2 s, abaixo do atraso de 0.3 s
+def test_queue_time_does_not_fire_hedges(faas):
+    client = Adaptive_FaaS("http://decisor", "config.yml", pool_size=1, hedge_delay=0.3, report_latency=False)
+    client.get_placement = lambda function_name, candidates=0, payload_bytes=None: (
+        faas.url("f"), "", [{"url": faas.url("f")}, {"url": faas.url("g")}])
+    try:
+        with ThreadPoolExecutor(max_workers=8) as callers:
+            results = list(callers.map(lambda _: client.request("f", b"x"), range(8)))
+    finally:
+        client.close()
+    assert [url for _, url in results] == [faas.url("f")] * 8
+    assert client.hedge_stats()["fired"] == 0
+    assert "g" not in faas.calls
@@ -0,0 +1,38 @@
+import pytest
+
+import adapt_exec_server as server
+
+CLOUD_URL = "http://cloud/function/f"
+HOST_URL = "http://a/function/f"
+
+def load_view(make_view):
+    view = make_view({"A": {}}, placement_policy="latency")
+    server.apply_report(view.url_index, CLOUD_URL, 1.0, "")
+    server.apply_report(view.url_index, HOST_URL, 2.0, "")
+    return view
+
+def decisions(view, count):
+    return [server.select_best_host(view.function_index, "f", "latency") for _ in range(count)]
+
+@pytest.fixture(params=["numpy", "loop"])
+def view(request, make_view):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    view = load_view(make_view)
+    if request.param == "loop":
+        for route in view.function_index.values():
+            route.arrays = None
+    return view
+
+# Host mais lento que a nuvem fica cortado, mas volta a ser medido a cada LATENCY_PROBE_EVERY
+def test_slow_host_is_probed_periodically(view):
+    chosen = decisions(view, 2 * server.LATENCY_PROBE_EVERY)
+    assert chosen.count(HOST_URL) == 2
+    assert chosen[server.LATENCY_PROBE_EVERY - 1] == HOST_URL
+
+# Cada sondagem rápida puxa a média móvel para baixo até o host passar a nuvem
+def test_recovered_host_comes_back(view):
+    for _ in range(5):
+        assert decisions(view, server.LATENCY_PROBE_EVERY)[-1] == HOST_URL
+        server.apply_report(view.url_index, HOST_URL, 0.1, "")
+    assert decisions(view, 10) == [HOST_URL] * 10
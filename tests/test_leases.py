@@ -0,0 +1,54 @@
+import time
+
+import adapt_exec_server as server
+from adapt_exec_client import Lease_cache
+
+HOST_URL = "http://a/function/f"
+CLOUD_URL = "http://cloud/function/f"
+
+def load_view(make_view, min_interval):
+    return make_view({"A": {"min_req_interval_secs": min_interval}}, lease_ttl_secs=30, lease_max_slots=10)
+
+def test_host_without_interval_grants_every_slot(make_view):
+    view = load_view(make_view, 0)
+    url, slots, _ = server.select_best_lease(view.function_index, "f", 10, 30)
+    assert (url, slots) == (HOST_URL, 10)
+
+# Os usos do lease ficam reservados no host, espaçados pelo intervalo mínimo
+def test_host_with_interval_reserves_spaced_uses(make_view):
+    view = load_view(make_view, 5)
+    now = time.time()
+    url, slots, _ = server.select_best_lease(view.function_index, "f", 10, 30)
+    assert (url, slots) == (HOST_URL, 6)
+    assert view.host_index["A"].state.last_use_ts >= now + 25
+    assert server.select_best_lease(view.function_index, "f", 10, 30)[:2] == (CLOUD_URL, 1)
+
+def test_cloud_fallback_is_single_use(make_view):
+    view = load_view(make_view, 0)
+    view.host_index["A"].state.publish(100.0, 10.0)
+    assert server.select_best_lease(view.function_index, "f", 10, 30)[:2] == (CLOUD_URL, 1)
+
+def test_lease_cache_paces_uses():
+    leases = Lease_cache()
+    # Reserva com folga no fim, para os atrasos do sleep não perderem usos
+    leases.put("f", HOST_URL, {"slots": 3, "ttl_secs": 30, "interval_secs": 0.05}, time.monotonic() + 10)
+    # O uso atual já contou; o próximo espera o intervalo
+    assert leases.take("f") is None
+    time.sleep(0.06)
+    assert leases.take("f") == HOST_URL
+    assert leases.take("f") is None
+    time.sleep(0.06)
+    assert leases.take("f") == HOST_URL
+    time.sleep(0.06)
+    assert leases.take("f") is None
+
+def test_lease_cache_drops_uses_past_the_reservation():
+    leases = Lease_cache()
+    leases.put("f", HOST_URL, {"slots": 3, "ttl_secs": 30, "interval_secs": 0.05}, time.monotonic() - 1)
+    assert leases.take("f") is None
+    assert "f" not in leases.leases
+
+def test_lease_cache_without_interval_is_not_paced():
+    leases = Lease_cache()
+    leases.put("f", HOST_URL, {"slots": 3, "ttl_secs": 30}, time.monotonic())
+    assert [leases.take("f") for _ in range(3)] == [HOST_URL, HOST_URL, None]
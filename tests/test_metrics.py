@@ -0,0 +1,48 @@
+import pytest
+
+import adapt_exec_server as server
+
+def exposition_lines(registry):
+    return registry.exposition().splitlines()
+
+# Gauge guarda o último valor de cada host
+def test_gauge_keeps_the_last_value():
+    registry = server.Metrics_registry()
+    registry.set("adapt_scrape_last_duration_seconds", 0.5, (("host", "A"),))
+    registry.set("adapt_scrape_last_duration_seconds", 0.25, (("host", "A"),))
+    lines = exposition_lines(registry)
+    assert "# TYPE adapt_scrape_last_duration_seconds gauge" in lines
+    assert 'adapt_scrape_last_duration_seconds{host="A"} 0.25' in lines
+
+def test_scrape_durations_are_exposed(monkeypatch):
+    monkeypatch.setattr(server, "server_metrics", server.Metrics_registry())
+    server.record_scrape_durations({"A": 0.5, "B": None})
+    lines = server.app.test_client().get("/metrics").get_data(as_text=True).splitlines()
+    assert 'adapt_scrape_last_duration_seconds{host="A"} 0.5' in lines
+    assert 'adapt_scrape_last_duration_seconds{host="B"} NaN' in lines
+
+# Nome de host com \, " ou quebra de linha não quebra a linha da métrica
+def test_label_values_are_escaped():
+    registry = server.Metrics_registry()
+    registry.inc("adapt_host_selected_total", (("host", 'a"b\\c\nd'),))
+    assert 'adapt_host_selected_total{host="a\\"b\\\\c\\nd"} 1' in exposition_lines(registry)
+
+# Os dois caminhos da decisão contam os mesmos recusados: todos os acima dos limites, não
+# só os percorridos até a escolha
+@pytest.mark.parametrize("path", ["numpy", "loop"])
+def test_rejections_are_counted_for_every_candidate(make_view, monkeypatch, path):
+    if path == "numpy":
+        pytest.importorskip("numpy")
+    registry = server.Metrics_registry()
+    monkeypatch.setattr(server, "server_metrics", registry)
+    view = make_view({"A": {}, "B": {}, "C": {}, "D": {}})
+    view.host_index["A"].state.publish(95.0, 10.0)
+    view.host_index["D"].state.publish(10.0, 95.0)
+    if path == "loop":
+        for route in view.function_index.values():
+            route.arrays = None
+
+    assert server.select_best_host(view.function_index, "f") == "http://b/function/f"
+    rejected = [line for line in exposition_lines(registry) if line.startswith("adapt_host_rejected_total{")]
+    assert rejected == ['adapt_host_rejected_total{host="A",reason="cpu"} 1',
+                        'adapt_host_rejected_total{host="D",reason="ram"} 1']
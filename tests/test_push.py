@@ -0,0 +1,31 @@
+import time
+
+import adapt_exec_server as server
+
+# Push velho não deixa o host parecer livre até a próxima coleta
+def test_stale_push_makes_host_unavailable(make_view):
+    view = make_view({"A": {}}, push_stale_secs=2)
+    assert server.ingest_push(view, "A", 10.0, 10.0)
+    assert server.select_best_host(view.function_index, "f") == "http://a/function/f"
+
+    host = view.host_index["A"]
+    host.state.metrics = server.Host_metrics(cpu_use=10.0, ram_use=10.0, timestamp=time.time() - 3,
+                                             pushed=True)
+    assert server.select_best_host(view.function_index, "f") == "http://cloud/function/f"
+    assert server.alternative_candidates(view.function_index, "f", "http://cloud/function/f", 1) == []
+
+# Métricas coletadas (sem push) continuam valendo até o próximo ciclo
+def test_old_scrape_is_still_used(make_view):
+    view = make_view({"A": {}}, push_stale_secs=2)
+    host = view.host_index["A"]
+    host.state.metrics = server.Host_metrics(cpu_use=10.0, ram_use=10.0, timestamp=time.time() - 60,
+                                             pushed=False)
+    assert server.select_best_host(view.function_index, "f") == "http://a/function/f"
+
+def test_stale_push_is_replaced_by_the_scrape(make_view):
+    view = make_view({"A": {}}, push_stale_secs=2)
+    host = view.host_index["A"]
+    host.state.metrics = server.Host_metrics(cpu_use=10.0, ram_use=10.0, timestamp=time.time() - 3,
+                                             pushed=True)
+    server.publish_scraped(host, 20.0, 20.0, time.time(), view.settings.push_stale)
+    assert server.select_best_host(view.function_index, "f") == "http://a/function/f"
@@ -0,0 +1,56 @@
+import adapt_exec_server as server
+
+HOST_URL = "http://a/function/f"
+CLOUD_URL = "http://cloud/function/f"
+
+def reload(view, config):
+    return server.reload_view(view, server.yaml.safe_dump(config))
+
+def load(make_config, **properties):
+    config = make_config({"A": {"max_concurrent": 1, "faas_urls": [HOST_URL, "http://a2/function/f"],
+                                **properties}})
+    view = reload(None, config)
+    view.host_index["A"].state.publish(10.0, 10.0)
+    return view, config
+
+def select(view):
+    url, _, ticket = server.select_best_lease(view.function_index, "f")
+    return url, ticket
+
+# Cada cliente reenvia a mesma configuração: nada é refeito
+def test_same_config_keeps_the_view(make_config):
+    view, config = load(make_config)
+    url, _ = select(view)
+    assert reload(view, config) is view
+    assert select(view)[0] == CLOUD_URL
+
+def test_changed_config_keeps_host_state(make_config):
+    view, config = load(make_config)
+    url, ticket = select(view)
+    server.apply_report(view.url_index, CLOUD_URL, 3.0, "")
+    server.apply_report(view.url_index, "http://a2/function/f", 2.0, "", payload_bytes=1000)
+    server.mark_failed(view.url_index, "http://a2/function/f", 60)
+
+    new_view = reload(view, {**config, "refresh_interval_secs": 30})
+    assert new_view is not view
+    host = new_view.host_index["A"]
+    # Vaga em andamento continua ocupada e o ticket antigo ainda a libera
+    assert select(new_view)[0] == CLOUD_URL
+    assert server.release_ticket(new_view.url_index, url, ticket)
+    assert new_view.cloud_host.latency.expected() == 3.0
+    assert host.state.latency.expected() == 2.0
+    assert host.link.count == 1
+    assert host.url_pools["f"].failed_until[1] > 0
+    assert new_view.function_index["f"].candidates[0][1] is host.url_pools["f"]
+
+# Vagas do host mudaram: tabela nova, e o ticket da anterior não libera a vaga de outra invocação
+def test_old_ticket_does_not_free_a_slot_after_reload(make_config):
+    view, config = load(make_config)
+    _, old_ticket = select(view)
+
+    config["hosts"]["A"]["max_concurrent"] = 2
+    new_view = reload(view, config)
+    _, ticket = select(new_view)
+    assert ticket and ticket != old_ticket
+    assert not server.release_ticket(new_view.url_index, HOST_URL, old_ticket)
+    assert new_view.host_index["A"].state.slots.in_flight(server.time.time()) == 1
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import pytest
+
+import adapt_exec_cache
+import adapt_exec_server as server
+from adapt_exec_cache import Result_cache
+
+# Relógio controlado pelo teste no lugar de time.monotonic
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(adapt_exec_cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+def test_least_recently_used_is_evicted_first(clock):
+    cache = Result_cache(max_bytes=30, ttl=60)
+    for key in ("a", "b", "c"):
+        assert cache.put(key, key.upper(), 10)
+    assert cache.get("a") == "A" # "b" passa a ser o menos usado
+    assert cache.put("d", "D", 10)
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["A", "C", "D"]
+    assert cache.snapshot()["evictions"] == 1
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = Result_cache(max_bytes=100, ttl=60)
+    cache.put("default", 1, 10)
+    cache.put("short", 2, 10, ttl=5)
+    clock.now += 5
+    assert cache.get("short") is None
+    assert cache.get("default") == 1
+    clock.now += 55
+    assert cache.get("default") is None
+    assert cache.snapshot()["bytes"] == 0
+
+def test_bytes_follow_puts_replacements_and_evictions(clock):
+    cache = Result_cache(max_bytes=100, ttl=60)
+    cache.put("a", 1, 40)
+    cache.put("b", 2, 30)
+    assert cache.bytes == 70
+    cache.put("a", 3, 10) # substituir desconta o tamanho antigo
+    assert cache.bytes == 40
+    cache.put("c", 4, 80) # "a" foi usado por último: só "b" sai para caber
+    assert cache.bytes == 90
+    assert list(cache.entries) == ["a", "c"]
+
+def test_value_larger_than_the_cache_is_rejected(clock):
+    cache = Result_cache(max_bytes=100, ttl=60)
+    cache.put("a", 1, 50)
+    assert not cache.put("big", 2, 101)
+    assert cache.get("a") == 1
+    assert cache.bytes == 50
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "result_cache", Result_cache(max_bytes=100, ttl=60))
+    return server.app.test_client()
+
+def test_cache_route_round_trip(client):
+    assert client.get("/faas/cache?key=k").status_code == 404
+    response = client.put("/faas/cache?key=k&url=http://a/function/f&ttl_secs=600", data=b'{"x": 1}',
+                          content_type="application/json")
+    assert response.status_code == 200
+    # A validade pedida não passa da do servidor
+    assert server.result_cache.entries["k"][0] <= adapt_exec_cache.time.monotonic() + 60
+
+    response = client.get("/faas/cache?key=k")
+    assert response.status_code == 200
+    assert response.data == b'{"x": 1}'
+    assert response.headers["Content-Type"] == "application/json"
+    assert response.headers["X-Faas-Url"] == "http://a/function/f"
+
+def test_cache_route_rejects_missing_key_and_oversized_body(client):
+    assert client.get("/faas/cache").status_code == 400
+    assert client.put("/faas/cache?key=k", data=b"x" * 101).status_code == 413
+    assert client.get("/faas/cache?key=k").status_code == 404
@@ -0,0 +1,28 @@
+import pytest
+
+import adapt_exec_server as server
+
+pytest.importorskip("numpy")
+
+def load_view(make_view, policy="round_robin"):
+    return make_view({"a": {}, "b": {}, "c": {"priority": "low", "layer": "fog"}}, placement_policy=policy)
+
+def test_candidates_do_not_advance_the_turn(make_view):
+    view = load_view(make_view)
+    chosen = []
+    for _ in range(10):
+        url = server.select_best_host(view.function_index, "f", "round_robin")
+        server.candidate_list(view, "f", url, 2)
+        chosen.append(url)
+    assert chosen.count("http://a/function/f") == 5
+    assert chosen.count("http://b/function/f") == 5
+
+def test_batch_rotates_within_the_first_tier(make_view):
+    view = load_view(make_view)
+    urls, _ = server.select_best_hosts(view.function_index, "f", 6, "round_robin")
+    assert sorted(urls) == ["http://a/function/f"] * 3 + ["http://b/function/f"] * 3
+
+def test_first_fit_batch_fills_the_first_host(make_view):
+    view = load_view(make_view, "first_fit")
+    urls, _ = server.select_best_hosts(view.function_index, "f", 4, "first_fit")
+    assert urls == ["http://a/function/f"] * 4
@@ -0,0 +1,18 @@
+import pytest
+
+import adapt_exec_server as server
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+# Corpo JSON que não é um objeto é recusado com 400, não derruba a rota
+@pytest.mark.parametrize("body", [[], [{"url": "http://a/function/f"}], "relato", 3])
+def test_report_rejects_non_object_body(client, body):
+    response = client.post("/faas/report", json=body)
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("body", [[], [{"host": "A", "cpu": 10, "ram": 10}], "métricas", 3])
+def test_metrics_push_rejects_non_object_body(client, body):
+    response = client.post("/faas/metrics", json=body)
+    assert response.status_code == 400
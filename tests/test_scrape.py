@@ -0,0 +1,57 @@
+import json
+from types import SimpleNamespace
+
+import adapt_exec_server as server
+
+def interval_at(make_view, cpu_use, ram_use):
+    view = make_view({"A": {"max_cpu_use": 80, "max_ram_use": 80}}, publish=(cpu_use, ram_use),
+                     adaptive_scrape=True, scrape_min_interval_secs=1, scrape_max_interval_secs=60)
+    return server.Scrape_scheduler(view).next_interval(view.host_index["A"], 0.0)
+
+def test_roomy_host_is_polled_less_often(make_view):
+    assert interval_at(make_view, 20.0, 20.0) == 45.0
+    assert interval_at(make_view, 70.0, 20.0) == 7.5
+
+# Host acima do limite não tem folga: fica no intervalo mínimo
+def test_host_over_its_limit_is_polled_at_the_minimum(make_view):
+    assert interval_at(make_view, 100.0, 20.0) == 1.0
+    assert interval_at(make_view, 20.0, 200.0) == 1.0
+
+SHARED_PROMETHEUS = "http://prom:9090/api/v1/query"
+
+# Prometheus falso: o compartilhado responde pelas instâncias a:9100 e x:9100 (que não é
+# de nenhum host); o próprio de cada host responde uma série sem label instance
+class Fake_prometheus:
+    def __init__(self):
+        self.queries = []
+
+    def get(self, url, params, timeout):
+        self.queries.append((url, params['query']))
+        cpu = params['query'] == server.QUERY_CPU
+        if url == SHARED_PROMETHEUS:
+            result = [{"metric": {"instance": "a:9100"}, "value": [0, "30" if cpu else "40"]},
+                      {"metric": {"instance": "x:9100"}, "value": [0, "1"]}]
+        else:
+            result = [{"metric": {}, "value": [0, "50" if cpu else "60"]}]
+        content = json.dumps({"status": "success", "data": {"result": result}})
+        return SimpleNamespace(content=content, raise_for_status=lambda: None)
+
+# Hosts do Prometheus compartilhado recebem o valor da própria instância numa consulta só;
+# host ausente da resposta fica indisponível
+def test_batched_scrape_maps_instances_to_hosts(make_view, monkeypatch):
+    prometheus = Fake_prometheus()
+    monkeypatch.setattr(server, "prometheus_session", prometheus)
+    view = make_view({"A": {"prometheus_api_url": SHARED_PROMETHEUS, "prometheus_instance": "a:9100"},
+                      "B": {"prometheus_api_url": SHARED_PROMETHEUS, "prometheus_instance": "b:9100"},
+                      "C": {}})
+
+    durations = server.update_metrics_routine(view.hosts, server.QUERY_CPU, server.QUERY_RAM)
+
+    metrics = {name: (host.state.metrics.cpu_use, host.state.metrics.ram_use)
+               for name, host in view.host_index.items()}
+    assert metrics == {"A": (30.0, 40.0), "B": (float('inf'), float('inf')), "C": (50.0, 60.0)}
+    assert sorted(prometheus.queries) == sorted([(SHARED_PROMETHEUS, server.QUERY_CPU),
+                                                 (SHARED_PROMETHEUS, server.QUERY_RAM),
+                                                 ("http://c:9000/api/v1/query", server.QUERY_CPU),
+                                                 ("http://c:9000/api/v1/query", server.QUERY_RAM)])
+    assert durations.keys() == {"A", "B", "C"}
@@ -0,0 +1,55 @@
+from array import array
+
+import adapt_exec_server as server
+
+CLOUD_URL = "http://cloud/function/f"
+HOST_URL = "http://a/function/f"
+LIMITED_URL = "http://a/function/g"
+
+def load_view(make_view, host_properties):
+    return make_view({"A": host_properties}, functions=("f", "g"), in_flight_timeout_secs=120)
+
+def select(view, function_name):
+    url, _, ticket = server.select_best_lease(view.function_index, function_name)
+    return url, ticket
+
+def test_unlisted_function_does_not_take_a_slot(make_view):
+    view = load_view(make_view, {"max_concurrent_per_function": {"g": 1}})
+    for _ in range(5):
+        url, ticket = select(view, "f")
+        assert url == HOST_URL
+        assert ticket == ""
+
+def test_listed_function_is_capped_until_release(make_view):
+    view = load_view(make_view, {"max_concurrent_per_function": {"g": 1}})
+    url, ticket = select(view, "g")
+    assert url == LIMITED_URL and ticket
+    assert select(view, "g")[0] == "http://cloud/function/g"
+
+    server.apply_report(view.url_index, url, 0.1, ticket)
+    assert select(view, "g")[0] == LIMITED_URL
+
+def test_max_concurrent_limits_every_function(make_view):
+    view = load_view(make_view, {"max_concurrent": 1})
+    url, ticket = select(view, "f")
+    assert url == HOST_URL and ticket
+    assert select(view, "f")[0] == CLOUD_URL
+    assert server.release_ticket(view.url_index, url, ticket)
+    assert select(view, "f")[0] == HOST_URL
+
+def test_slot_expires_after_timeout():
+    slots = server.Slot_table(array('d', bytes(8 * server.SLOT_FIELDS)), 0, 1, 10, {"g": (1, 1)}, False)
+    ticket = slots.acquire(100.0, "g")
+    assert ticket
+    assert slots.acquire(105.0, "g") is None
+    assert slots.acquire(111.0, "g")
+    # Ticket da vaga expirada (já reusada) não libera a vaga nova
+    assert not slots.release(ticket)
+    assert slots.in_flight(111.0) == 1
+
+def test_release_is_idempotent():
+    slots = server.Slot_table(array('d', bytes(8 * server.SLOT_FIELDS)), 0, 1, 10, {}, True)
+    ticket = slots.acquire(0.0, "f")
+    assert slots.release(ticket)
+    assert not slots.release(ticket)
+    assert not slots.release("lixo")
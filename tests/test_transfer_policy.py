@@ -0,0 +1,57 @@
+import pytest
+
+import adapt_exec_server as server
+
+MB = 1024 * 1024
+SIZES = (0, MB // 4, MB // 2, MB)
+
+# Latência exatamente linear no tamanho: a regressão acha a parte fixa e o tempo por byte
+def test_link_fits_fixed_and_per_byte():
+    link = server.Link_stats()
+    for index in range(40):
+        size = SIZES[index % len(SIZES)]
+        link.add(size, 0.01 + size * 1e-6)
+    assert link.fixed == pytest.approx(0.01, rel=1e-6)
+    assert link.per_byte == pytest.approx(1e-6, rel=1e-6)
+    assert link.expected(2 * MB) == pytest.approx(0.01 + 2 * MB * 1e-6, rel=1e-6)
+
+# Sem variação de tamanho a inclinação não vale: fica o tempo por byte do config.yml
+def test_link_without_spread_keeps_the_prior():
+    link = server.Link_stats(rtt_ms=20, bandwidth_mbps=8)
+    assert (link.fixed, link.per_byte) == (0.02, 1e-6)
+    for _ in range(10):
+        link.add(1000, 0.5)
+    assert link.per_byte == 1e-6
+    assert link.fixed == pytest.approx(0.5 - 1000 * 1e-6)
+
+# A: perto e lento (rede local fraca), B: longe e rápido, nuvem no meio
+@pytest.fixture(params=["numpy", "loop"])
+def view(request, make_config):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    config = make_config({"A": {}, "B": {}}, placement_policy="transfer")
+    config["hosts"]["Cloud"].update(rtt_ms=100, bandwidth_mbps=100)
+    view = server.build_view(*server.parse_config(server.yaml.safe_dump(config)))
+    for host in view.hosts:
+        host.state.publish(10.0, 10.0)
+    for index in range(40):
+        size = SIZES[index % len(SIZES)]
+        server.apply_report(view.url_index, "http://a/function/f", 0.01 + size * 1e-6, "", payload_bytes=size)
+        server.apply_report(view.url_index, "http://b/function/f", 0.05 + size * 1e-8, "", payload_bytes=size)
+    if request.param == "loop":
+        for route in view.function_index.values():
+            route.arrays = None
+    return view
+
+def order(view, payload_bytes):
+    candidates = server.ordered_candidates(view.function_index["f"], "transfer", record=False,
+                                           payload_bytes=payload_bytes)
+    return [host.getname() for host, _ in candidates]
+
+# Payload pequeno vai para o host perto; grande para o de rede rápida, e o lento fica
+# cortado por ser pior que a nuvem (0,1 s + 8e-8 s/byte)
+def test_transfer_orders_by_fitted_link(view):
+    assert order(view, 0) == ["A", "B"]
+    assert order(view, MB) == ["B"]
+    assert server.select_best_host(view.function_index, "f", "transfer", payload_bytes=0) == "http://a/function/f"
+    assert server.select_best_host(view.function_index, "f", "transfer", payload_bytes=MB) == "http://b/function/f"